@@ -0,0 +1,44 @@
+"""Add status to reviews.
+
+Revision ID: 3b1f6c2d9a47
+Revises: f92e10a775cc
+Create Date: 2024-07-20 10:12:31.184520
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b1f6c2d9a47"
+down_revision: Union[str, None] = "f92e10a775cc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing reviews were created synchronously, hence they are done.
+    op.add_column(
+        "reviews",
+        sa.Column("status", sa.String(), nullable=False, server_default="done"),
+        schema="reviewer_app",
+    )
+    op.add_column(
+        "reviews",
+        sa.Column("files_total", sa.Integer(), nullable=False, server_default="0"),
+        schema="reviewer_app",
+    )
+    op.add_column(
+        "reviews",
+        sa.Column("files_done", sa.Integer(), nullable=False, server_default="0"),
+        schema="reviewer_app",
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("reviews", "files_done", schema="reviewer_app")
+    op.drop_column("reviews", "files_total", schema="reviewer_app")
+    op.drop_column("reviews", "status", schema="reviewer_app")
@@ -0,0 +1,54 @@
+"""Add pull request snapshots.
+
+Revision ID: 7d4e2a9c1f05
+Revises: 3b1f6c2d9a47
+Create Date: 2024-07-21 16:40:08.532917
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7d4e2a9c1f05"
+down_revision: Union[str, None] = "3b1f6c2d9a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app creates missing tables on startup.
+    if not op.get_bind().dialect.has_table(
+        op.get_bind(),
+        "pullrequestsnapshots",
+        schema="reviewer_app",
+    ):
+        op.create_table(
+            "pullrequestsnapshots",
+            sa.Column("pull_request_id", sa.Integer(), nullable=False),
+            sa.Column("etag", sa.String(), nullable=True),
+            sa.Column("last_modified", sa.String(), nullable=True),
+            sa.Column("base_sha", sa.String(), nullable=True),
+            sa.Column("head_sha", sa.String(), nullable=True),
+            sa.Column("file_changes", sa.LargeBinary(), nullable=False),
+            sa.Column(
+                "updated_at",
+                sa.DateTime(timezone=True),
+                server_default=sa.text("now()"),
+                nullable=False,
+            ),
+            sa.ForeignKeyConstraint(
+                ["pull_request_id"],
+                ["reviewer_app.pullrequests.id"],
+                ondelete="CASCADE",
+            ),
+            sa.PrimaryKeyConstraint("pull_request_id"),
+            schema="reviewer_app",
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("pullrequestsnapshots", schema="reviewer_app")
@@ -0,0 +1,31 @@
+"""Add failure reason to reviews.
+
+Revision ID: a4d7e93b5c18
+Revises: e8b4c2d71a36
+Create Date: 2024-08-06 14:27:19.640213
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d7e93b5c18"
+down_revision: Union[str, None] = "e8b4c2d71a36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "reviews",
+        sa.Column("failure_reason", sa.String(), nullable=True),
+        schema="reviewer_app",
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("reviews", "failure_reason", schema="reviewer_app")
@@ -0,0 +1,45 @@
+"""Add cached file reviews.
+
+Revision ID: a8c35e7b2d91
+Revises: 7d4e2a9c1f05
+Create Date: 2024-07-22 09:03:47.271604
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a8c35e7b2d91"
+down_revision: Union[str, None] = "7d4e2a9c1f05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app creates missing tables on startup.
+    if not op.get_bind().dialect.has_table(
+        op.get_bind(),
+        "cachedfilereviews",
+        schema="reviewer_app",
+    ):
+        op.create_table(
+            "cachedfilereviews",
+            sa.Column("key", sa.String(length=64), nullable=False),
+            sa.Column("content", sa.String(), nullable=False),
+            sa.Column(
+                "created_at",
+                sa.DateTime(timezone=True),
+                server_default=sa.text("now()"),
+                nullable=False,
+            ),
+            sa.PrimaryKeyConstraint("key"),
+            schema="reviewer_app",
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("cachedfilereviews", schema="reviewer_app")
@@ -0,0 +1,31 @@
+"""Add file filter to repositories.
+
+Revision ID: b7f2d4e81c36
+Revises: e5a7b3c90d12
+Create Date: 2024-07-26 10:12:03.518274
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7f2d4e81c36"
+down_revision: Union[str, None] = "e5a7b3c90d12"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column("file_filter", sa.JSON(), nullable=True),
+        schema="reviewer_app",
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("repositories", "file_filter", schema="reviewer_app")
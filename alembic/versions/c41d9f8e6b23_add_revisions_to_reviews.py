@@ -0,0 +1,72 @@
+"""Add revisions to reviews.
+
+Revision ID: c41d9f8e6b23
+Revises: a8c35e7b2d91
+Create Date: 2024-07-23 11:27:15.904381
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c41d9f8e6b23"
+down_revision: Union[str, None] = "a8c35e7b2d91"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "reviews",
+        sa.Column("base_sha", sa.String(), nullable=True),
+        schema="reviewer_app",
+    )
+    op.add_column(
+        "reviews",
+        sa.Column("head_sha", sa.String(), nullable=True),
+        schema="reviewer_app",
+    )
+    op.add_column(
+        "filereviews",
+        sa.Column("carried_over_from_id", sa.Integer(), nullable=True),
+        schema="reviewer_app",
+    )
+    op.create_foreign_key(
+        "filereviews_carried_over_from_id_fkey",
+        "filereviews",
+        "filereviews",
+        ["carried_over_from_id"],
+        ["id"],
+        source_schema="reviewer_app",
+        referent_schema="reviewer_app",
+    )
+    op.alter_column(
+        "filereviews",
+        "content",
+        existing_type=sa.String(),
+        nullable=True,
+        schema="reviewer_app",
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "filereviews",
+        "content",
+        existing_type=sa.String(),
+        nullable=False,
+        schema="reviewer_app",
+    )
+    op.drop_constraint(
+        "filereviews_carried_over_from_id_fkey",
+        "filereviews",
+        schema="reviewer_app",
+        type_="foreignkey",
+    )
+    op.drop_column("filereviews", "carried_over_from_id", schema="reviewer_app")
+    op.drop_column("reviews", "head_sha", schema="reviewer_app")
+    op.drop_column("reviews", "base_sha", schema="reviewer_app")
@@ -0,0 +1,43 @@
+"""Add position and timings to file reviews.
+
+Revision ID: d3a8f61c47e2
+Revises: b7f2d4e81c36
+Create Date: 2024-07-29 09:41:27.204816
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d3a8f61c47e2"
+down_revision: Union[str, None] = "b7f2d4e81c36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "filereviews",
+        sa.Column("position", sa.Integer(), nullable=True),
+        schema="reviewer_app",
+    )
+    op.add_column(
+        "filereviews",
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        schema="reviewer_app",
+    )
+    op.add_column(
+        "filereviews",
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        schema="reviewer_app",
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("filereviews", "finished_at", schema="reviewer_app")
+    op.drop_column("filereviews", "started_at", schema="reviewer_app")
+    op.drop_column("filereviews", "position", schema="reviewer_app")
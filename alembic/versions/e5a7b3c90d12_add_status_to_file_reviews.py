@@ -0,0 +1,37 @@
+"""Add status to file reviews.
+
+Revision ID: e5a7b3c90d12
+Revises: c41d9f8e6b23
+Create Date: 2024-07-24 14:51:39.660218
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a7b3c90d12"
+down_revision: Union[str, None] = "c41d9f8e6b23"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "filereviews",
+        sa.Column("status", sa.String(), nullable=False, server_default="done"),
+        schema="reviewer_app",
+    )
+    op.add_column(
+        "filereviews",
+        sa.Column("reason", sa.String(), nullable=True),
+        schema="reviewer_app",
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("filereviews", "reason", schema="reviewer_app")
+    op.drop_column("filereviews", "status", schema="reviewer_app")
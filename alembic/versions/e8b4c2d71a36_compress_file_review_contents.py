@@ -0,0 +1,108 @@
+"""Compress file review contents.
+
+Revision ID: e8b4c2d71a36
+Revises: f1c6e9a2b853
+Create Date: 2024-08-05 10:12:48.531907
+
+"""
+
+import logging
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import context, op
+from api.config import config
+from api.utils.compression import get_file_review_codec
+
+# revision identifiers, used by Alembic.
+revision: str = "e8b4c2d71a36"
+down_revision: Union[str, None] = "f1c6e9a2b853"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger(f"alembic.runtime.migration.{revision}")
+
+BATCH_SIZE = 1000
+
+file_reviews = sa.table(
+    "filereviews",
+    sa.column("id", sa.Integer()),
+    sa.column("content", sa.String()),
+    sa.column("content_zstd", sa.LargeBinary()),
+    schema="reviewer_app",
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        "filereviews",
+        sa.Column("content_zstd", sa.LargeBinary(), nullable=True),
+        schema="reviewer_app",
+    )
+
+    codec = get_file_review_codec()
+    if context.is_offline_mode():
+        logger.info("Not compressing existing contents in offline mode.")
+        return
+    if codec is None or config.file_review_storage.compression != "zstd":
+        logger.info("Not compressing existing contents, compression is disabled.")
+        return
+
+    # Compress in batches, such that the contents are never all in memory.
+    connection = op.get_bind()
+    last_id = 0
+    while rows := connection.execute(
+        sa.select(file_reviews.c.id, file_reviews.c.content)
+        .where(
+            file_reviews.c.id > last_id,
+            file_reviews.c.content.is_not(None),
+            file_reviews.c.content_zstd.is_(None),
+        )
+        .order_by(file_reviews.c.id)
+        .limit(BATCH_SIZE),
+    ).all():
+        connection.execute(
+            sa.update(file_reviews)
+            .where(file_reviews.c.id == sa.bindparam("row_id"))
+            .values(content=None, content_zstd=sa.bindparam("compressed")),
+            [
+                {"row_id": row.id, "compressed": codec.compress(row.content)}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if not context.is_offline_mode():
+        codec = get_file_review_codec()
+        last_id = 0
+        while rows := connection.execute(
+            sa.select(file_reviews.c.id, file_reviews.c.content_zstd)
+            .where(
+                file_reviews.c.id > last_id,
+                file_reviews.c.content_zstd.is_not(None),
+            )
+            .order_by(file_reviews.c.id)
+            .limit(BATCH_SIZE),
+        ).all():
+            if codec is None:
+                message = "Decompressing file reviews requires the zstandard package."
+                raise RuntimeError(message)
+            connection.execute(
+                sa.update(file_reviews)
+                .where(file_reviews.c.id == sa.bindparam("row_id"))
+                .values(content=sa.bindparam("decompressed"), content_zstd=None),
+                [
+                    {
+                        "row_id": row.id,
+                        "decompressed": codec.decompress(row.content_zstd),
+                    }
+                    for row in rows
+                ],
+            )
+            last_id = rows[-1].id
+
+    op.drop_column("filereviews", "content_zstd", schema="reviewer_app")
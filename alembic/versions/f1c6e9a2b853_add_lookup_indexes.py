@@ -0,0 +1,155 @@
+"""Add indexes on lookup columns and unique pull requests.
+
+Revision ID: f1c6e9a2b853
+Revises: d3a8f61c47e2
+Create Date: 2024-07-30 16:03:52.817340
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "f1c6e9a2b853"
+down_revision: Union[str, None] = "d3a8f61c47e2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Name, table, columns and schema of the indexes. Foreign keys are indexed
+# along with the ID, such that pages of a list are read in index order.
+INDEXES = [
+    (
+        "ix_pullrequests_repository_id_id",
+        "pullrequests",
+        ["repository_id", "id"],
+        "reviewer_app",
+    ),
+    (
+        "ix_reviews_pull_request_id_id",
+        "reviews",
+        ["pull_request_id", "id"],
+        "reviewer_app",
+    ),
+    ("ix_filereviews_review_id", "filereviews", ["review_id"], "reviewer_app"),
+    ("ix_users_username", "users", ["username"], "common_app"),
+]
+UNIQUE_PULL_REQUEST = "uq_pullrequests_repository_id_pull_request_number"
+# Duplicate pull requests listed when they prevent the unique index.
+MAX_LISTED_DUPLICATES = 10
+
+
+def upgrade() -> None:
+    # Concurrent builds do not block writes to the tables, but cannot run in a
+    # transaction. The app creates the indexes along with missing tables on
+    # startup, so they may exist already.
+    _check_duplicate_pull_requests()
+    with op.get_context().autocommit_block():
+        for name, table, columns, schema in INDEXES:
+            _drop_invalid_index(name, schema=schema)
+            op.create_index(
+                name,
+                table,
+                columns,
+                schema=schema,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+        _drop_invalid_index(UNIQUE_PULL_REQUEST, schema="reviewer_app")
+        op.create_index(
+            UNIQUE_PULL_REQUEST,
+            "pullrequests",
+            ["repository_id", "pull_request_number"],
+            unique=True,
+            schema="reviewer_app",
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+    if context.is_offline_mode() or UNIQUE_PULL_REQUEST not in {
+        constraint["name"]
+        for constraint in sa.inspect(op.get_bind()).get_unique_constraints(
+            "pullrequests",
+            schema="reviewer_app",
+        )
+    }:
+        # Only takes a brief lock, since the index is already built.
+        op.execute(
+            f"ALTER TABLE reviewer_app.pullrequests ADD CONSTRAINT "
+            f"{UNIQUE_PULL_REQUEST} UNIQUE USING INDEX {UNIQUE_PULL_REQUEST}",
+        )
+
+
+def _check_duplicate_pull_requests() -> None:
+    """Abort if a pull request is registered twice, which the unique index forbids.
+
+    :raises RuntimeError: If there are duplicate pull requests.
+    """
+    if context.is_offline_mode():
+        return
+    duplicates = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT repository_id, pull_request_number, array_agg(id ORDER BY id) "
+                "FROM reviewer_app.pullrequests "
+                "GROUP BY repository_id, pull_request_number "
+                "HAVING count(*) > 1 "
+                "ORDER BY repository_id, pull_request_number "
+                "LIMIT :limit",
+            ),
+            {"limit": MAX_LISTED_DUPLICATES},
+        )
+        .all()
+    )
+    if duplicates:
+        listed = "; ".join(
+            f"repository {repository_id} pull request {pull_request_number} "
+            f"(IDs {', '.join(map(str, ids))})"
+            for repository_id, pull_request_number, ids in duplicates
+        )
+        message = (
+            "Pull requests are registered more than once, keep one of each and "
+            f"delete the others before upgrading: {listed}."
+        )
+        raise RuntimeError(message)
+
+
+def _drop_invalid_index(name: str, schema: str) -> None:
+    """Drop an index left invalid by a failed concurrent build.
+
+    Creating the index if it does not exist would otherwise keep the invalid one.
+
+    :param name: The name of the index.
+    :param schema: The schema of the index.
+    """
+    if context.is_offline_mode():
+        return
+    is_invalid = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT NOT pg_index.indisvalid FROM pg_index "
+                "JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "JOIN pg_namespace ON pg_namespace.oid = pg_class.relnamespace "
+                "WHERE pg_class.relname = :name AND pg_namespace.nspname = :schema",
+            ),
+            {"name": name, "schema": schema},
+        )
+        .scalar()
+    )
+    if is_invalid:
+        op.drop_index(name, schema=schema, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_constraint(UNIQUE_PULL_REQUEST, "pullrequests", schema="reviewer_app")
+    with op.get_context().autocommit_block():
+        for name, table, _, schema in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                schema=schema,
+                postgresql_concurrently=True,
+            )
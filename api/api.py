@@ -4,12 +4,19 @@ import logging
 
 from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 
 from api.common.routes.general_routes import general_router
+from api.common.tools.tool import prompt_template_registry
+from api.config import config
 from api.reviewer.routes.reviewer_routes import reviewer_router
+from api.utils.background import shutdown_background_executors
+from api.utils.batch_writer import close_batch_writers
 from api.utils.constants import ApplicationTags
 from api.utils.database import init_db
+from api.utils.github import github_client
+from api.utils.llm import close_http_clients
+from api.utils.passwords import password_hashing_pool
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +39,7 @@ api = FastAPI(
     title="apPRoved",
     description="apPRoved API",
     version="0.0.1",
+    default_response_class=ORJSONResponse,
 )
 
 api.add_middleware(  # CORS
@@ -60,3 +68,15 @@ api.include_router(reviewer_router, tags=["/api/reviewer"])
 async def on_startup() -> None:
     """Run hooks on startup."""
     await init_db()
+    await github_client.start()
+    prompt_template_registry.load_all()
+
+
+@api.on_event("shutdown")
+async def on_shutdown() -> None:
+    """Run hooks on shutdown."""
+    await shutdown_background_executors(timeout=config.shutdown_timeout)
+    await close_batch_writers(timeout=config.shutdown_timeout)
+    await github_client.close()
+    await close_http_clients()
+    password_hashing_pool.shutdown()
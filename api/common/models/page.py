@@ -0,0 +1,20 @@
+"""Page model."""
+
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """A page of a list ordered by ID.
+
+    Attributes
+    ----------
+    - items: The items of the page.
+    - next_after: The ID to list the next page after, or None on the last page.
+    """
+
+    items: list[T]
+    next_after: int | None = None
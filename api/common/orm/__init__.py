@@ -1,5 +1,7 @@
 from api.common.orm.base import Base
 from api.common.orm.users import Users
+from api.reviewer.orm.cached_file_reviews import CachedFileReviews
+from api.reviewer.orm.pull_request_snapshots import PullRequestSnapshots
 from api.reviewer.orm.pull_requests import PullRequests
 from api.reviewer.orm.repositories import Repositories
 from api.reviewer.orm.reviews import FileReviews, Reviews
@@ -2,7 +2,7 @@
 
 from typing import ClassVar
 
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, Index, Integer, String
 
 from api.common.orm.base import Base
 from api.config import config
@@ -12,7 +12,10 @@ class Users(Base):
     """ORM class to represent a user."""
 
     __tablename__ = "users"
-    __table_args__: ClassVar = {"schema": config.database.common.app}
+    __table_args__: ClassVar = (
+        Index("ix_users_username", "username"),
+        {"schema": config.database.common.app},
+    )
 
     id = Column(
         Integer,
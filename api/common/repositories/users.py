@@ -1,6 +1,5 @@
 """User repository."""
 
-from bcrypt import gensalt, hashpw
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from sqlalchemy.sql import select
@@ -8,6 +7,7 @@ from sqlalchemy.sql import select
 from api.common.models.user import User
 from api.common.orm.users import Users
 from api.utils.database import database_session, orm_to_pydantic
+from api.utils.passwords import hash_password
 
 
 async def read_user(username: str) -> User:
@@ -47,10 +47,12 @@ async def create_user(
     password: str,
 ) -> User:
     """Create a user."""
+    # Hashed before a connection is checked out, which is held for the session.
+    password_hash = await hash_password(password)
     async with database_session() as session:
         user = Users(
             username=username,
-            password_hash=_get_password_hash(password),
+            password_hash=password_hash,
             is_active=True,
             is_superuser=False,
         )
@@ -58,8 +60,3 @@ async def create_user(
         await session.commit()
         await session.refresh(user)
         return user
-
-
-def _get_password_hash(password: str) -> str:
-    """Get a password hash."""
-    return hashpw(password.encode("utf-8"), gensalt()).decode("utf-8")
@@ -3,7 +3,7 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 
 from api.common.dto.requests import CreateUserRequest
@@ -11,7 +11,9 @@ from api.common.dto.responses import TokenResponse, UserResponse
 from api.common.models.user import User
 from api.common.services import auth_service
 from api.common.services.auth_service import get_current_user
+from api.config import reload_config
 from api.utils.constants import ApplicationTags
+from api.utils.metrics import metrics
 
 general_router = APIRouter()
 
@@ -24,7 +26,7 @@ security = HTTPBasic()
 )
 async def register(
     create_user_request: CreateUserRequest,
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Register a user."""
     if not create_user_request.username or not create_user_request.password:
         raise HTTPException(
@@ -40,7 +42,7 @@ async def register(
 
     headers = {"Location": "/api/token/"}
 
-    return JSONResponse(
+    return ORJSONResponse(
         content=response_payload,
         headers=headers,
         status_code=status.HTTP_201_CREATED,
@@ -66,7 +68,7 @@ async def login_for_access_token(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = auth_service.create_access_token(data={"username": user.username})
+    access_token = auth_service.create_access_token(user=user)
     return TokenResponse(access_token=access_token, token_type="bearer")
 
 
@@ -85,3 +87,35 @@ async def read_users_me(
         is_active=current_user.is_active,
         is_superuser=current_user.is_superuser,
     )
+
+
+@general_router.get(
+    "/metrics",
+    tags=[ApplicationTags.DEFAULT_TAG],
+)
+async def read_metrics(
+    _user: Annotated[User, Depends(get_current_user)],
+) -> dict[str, float]:
+    """Read the metrics of this process."""
+    return metrics.collect()
+
+
+@general_router.post(
+    "/config/reload",
+    tags=[ApplicationTags.DEFAULT_TAG],
+)
+async def reload_configuration(
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> ORJSONResponse:
+    """Reload the configuration from disk."""
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only superusers may reload the configuration.",
+        )
+
+    reload_config()
+    return ORJSONResponse(
+        content={"message": "Configuration reloaded."},
+        status_code=status.HTTP_200_OK,
+    )
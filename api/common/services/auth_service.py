@@ -1,27 +1,37 @@
 """Authentication service."""
 
-from typing import Annotated
+from datetime import UTC, datetime, timedelta
+from typing import Annotated, Any
 
-from bcrypt import checkpw
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBasic, OAuth2PasswordBearer
 from jose import JWTError, jwt
 
 import api.common.repositories.users as users_repository
 from api.common.models.user import User
-from api.config import config
+from api.common.services.token_cache import token_cache
+from api.config import config, register_reload_hook
+from api.utils.passwords import verify_password
 
 security = HTTPBasic()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
-    """Get the current user."""
+    """Get the current user.
+
+    Validated tokens are cached for a while, such that repeated requests with
+    the same token neither decode it nor read the user again. Changes to a user
+    therefore take effect within the TTL of the cache.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if config.auth.token_cache.enabled and (user := token_cache.get(token)):
+        return user
+
     try:
         payload = jwt.decode(
             token,
@@ -34,16 +44,41 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Use
     except JWTError as e:
         raise credentials_exception from e
 
-    try:
-        user = await users_repository.read_user(username=username)
-        if user is None:
-            raise credentials_exception
-    except HTTPException as e:
-        raise credentials_exception from e
-
+    user = _get_user_from_claims(payload) if config.auth.trust_token_claims else None
+    if user is None:
+        try:
+            user = await users_repository.read_user(username=username)
+            if user is None:
+                raise credentials_exception
+        except HTTPException as e:
+            raise credentials_exception from e
+    if not user.is_active:
+        raise credentials_exception
+
+    if config.auth.token_cache.enabled:
+        token_cache.set(token, user, expires_at=payload.get("exp"))
     return user
 
 
+def _get_user_from_claims(payload: dict[str, Any]) -> User | None:
+    """Get the user from the signed claims of a token, without the database.
+
+    :param payload: The decoded payload of the token.
+    :return: The user, or None if the token lacks the claims or an expiry.
+    """
+    claims = ("uid", "is_active", "is_superuser", "exp")
+    if any(payload.get(claim) is None for claim in claims):
+        return None
+    return User(
+        id=payload["uid"],
+        username=payload["sub"],
+        # Tokens do not carry the password hash.
+        password_hash="",
+        is_active=payload["is_active"],
+        is_superuser=payload["is_superuser"],
+    )
+
+
 async def authenticate_user(
     username: str,
     password: str,
@@ -62,10 +97,7 @@ async def authenticate_user(
             headers={"WWW-Authenticate": "Basic"},
         ) from None
 
-    if not checkpw(
-        password.encode("utf-8"),
-        user.password_hash.encode("utf-8"),
-    ):
+    if not await verify_password(password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password.",
@@ -86,8 +118,35 @@ async def create_user(
     )
 
 
-def create_access_token(data: dict) -> str:
-    """Create a JWT access token."""
-    to_encode = data.copy()
-    to_encode.update({"sub": data["username"]})
+def create_access_token(user: User) -> str:
+    """Create a JWT access token.
+
+    The token carries the status of the user, signed, such that it can be
+    trusted without reading the user, see `auth.trust_token_claims`.
+
+    :param user: The user the token is for.
+    :return: The encoded token.
+    """
+    to_encode = {
+        "username": user.username,
+        "sub": user.username,
+        "uid": user.id,
+        "is_active": user.is_active,
+        "is_superuser": user.is_superuser,
+    }
+    if config.auth.access_token_expire_minutes is not None:
+        expires_at = datetime.now(UTC) + timedelta(
+            minutes=config.auth.access_token_expire_minutes,
+        )
+        to_encode["exp"] = int(expires_at.timestamp())
     return jwt.encode(to_encode, config.secret_key, algorithm=config.secret_algorithm)
+
+
+def _on_config_reload() -> None:
+    """Apply the token cache settings, forgetting tokens validated under the old."""
+    token_cache.ttl = config.auth.token_cache.ttl
+    token_cache.max_entries = config.auth.token_cache.max_entries
+    token_cache.clear()
+
+
+register_reload_hook(_on_config_reload)
@@ -0,0 +1,88 @@
+"""In-process cache of validated access tokens."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Self
+
+from api.config import config
+from api.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from api.common.models.user import User
+
+
+class TokenCache:
+    """Cache of the users of validated access tokens, for a limited time.
+
+    Entries expire after the TTL or with their token, whichever is first. The
+    cached users are not invalidated: changes to a user take effect within the
+    TTL.
+    """
+
+    def __init__(self: Self, ttl: float, max_entries: int) -> None:
+        """Initialize the cache.
+
+        :param ttl: Seconds a validated token is trusted without checking it again.
+        :param max_entries: Number of tokens kept, evicting the least recently used.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+
+    def get(self: Self, token: str) -> User | None:
+        """Get the user of a validated token.
+
+        :param token: The access token.
+        :return: The user, or None if the token is not cached or expired.
+        """
+        entry = self._entries.get(token)
+        if entry is None:
+            metrics.increment("token_cache.misses")
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.time():
+            del self._entries[token]
+            metrics.increment("token_cache.misses")
+            return None
+
+        self._entries.move_to_end(token)
+        metrics.increment("token_cache.hits")
+        return user
+
+    def set(
+        self: Self,
+        token: str,
+        user: User,
+        expires_at: float | None = None,
+    ) -> None:
+        """Cache the user of a validated token.
+
+        :param token: The access token.
+        :param user: The user the token belongs to.
+        :param expires_at: Unix time the token expires at, if it does.
+        """
+        cached_until = time.time() + self.ttl
+        if expires_at is not None:
+            cached_until = min(cached_until, expires_at)
+        self._entries[token] = (cached_until, user)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self: Self) -> None:
+        """Forget all tokens."""
+        self._entries.clear()
+
+    def __len__(self: Self) -> int:
+        """Count the cached tokens."""
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    ttl=config.auth.token_cache.ttl,
+    max_entries=config.auth.token_cache.max_entries,
+)
+metrics.register_gauge("token_cache.size", lambda: len(token_cache))
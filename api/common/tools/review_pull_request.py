@@ -34,7 +34,24 @@ class ReviewPullRequest:
         logger.info(f"Run {cls.tool} tool.")
 
         request: PullRequestFileChanges = get_kwarg(kwargs, "request")
+        prompts: tuple[str, str] | None = kwargs.get("prompts")
 
+        system_prompt, user_prompt = prompts or cls.get_prompts(request=request)
+        return ask_llm(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+        )
+
+    @classmethod
+    def get_prompts(
+        cls: type[ReviewPullRequest],
+        request: PullRequestFileChanges,
+    ) -> tuple[str, str]:
+        """Get the prompts to review the changes of a file.
+
+        :param request: The changes of the file to review.
+        :return: The system prompt and the user prompt.
+        """
         template_path = get_tool_config_path(cls.tool)
         system_prompt = get_hydrated_prompt(
             template_path=template_path,
@@ -46,7 +63,4 @@ class ReviewPullRequest:
             filename=request.filename,
             patch=request.patch,
         )
-        return ask_llm(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-        )
+        return system_prompt, user_prompt
@@ -0,0 +1,78 @@
+"""Tool to review the changes of several files of a pull request at once."""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import TYPE_CHECKING, Any, AsyncIterator
+
+from api.common.models.message import PromptType
+from api.common.tools.tool import get_hydrated_prompt, get_kwarg, get_tool_config_path
+from api.utils.constants import Tools
+from api.utils.llm import ask_llm
+
+if TYPE_CHECKING:
+    from api.reviewer.models.pull_request import PullRequestFileChanges
+
+logger = logging.getLogger(__name__)
+
+# Line the LLM is asked to start the review of each file with.
+FILE_MARKER_PATTERN = re.compile(r"^\s*<<<FILE: (?P<filename>.+?)>>>\s*$", re.MULTILINE)
+
+
+class ReviewPullRequestBatch:
+    """A tool for reviewing several files of a pull request in one request."""
+
+    tool: Tools = Tools.REVIEW_PULL_REQUEST_BATCH
+
+    @classmethod
+    async def arun(
+        cls: type[ReviewPullRequestBatch],
+        *args: Any,
+        **kwargs: Any,
+    ) -> AsyncIterator[str]:
+        """Use the tool asynchronously.
+
+        :return: Tool output.
+        """
+        logger.info(f"Run {cls.tool} tool.")
+
+        requests: list[PullRequestFileChanges] = get_kwarg(kwargs, "requests")
+
+        template_path = get_tool_config_path(cls.tool)
+        system_prompt = get_hydrated_prompt(
+            template_path=template_path,
+            prompt_type=PromptType.system,
+        )
+        user_prompt = get_hydrated_prompt(
+            template_path=template_path,
+            prompt_type=PromptType.user,
+            requests=requests,
+        )
+        return ask_llm(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+        )
+
+    @staticmethod
+    def parse_answer(answer: str, filenames: list[str]) -> dict[str, str] | None:
+        """Split the answer of the LLM into the reviews of the files.
+
+        :param answer: The answer of the LLM.
+        :param filenames: The names of the reviewed files.
+        :return: The review per file name, or None if the answer does not hold
+            exactly one non-empty review for every file.
+        """
+        markers = list(FILE_MARKER_PATTERN.finditer(answer))
+        reviews: dict[str, str] = {}
+        for marker, next_marker in zip(markers, [*markers[1:], None], strict=True):
+            filename = marker.group("filename").strip()
+            end = next_marker.start() if next_marker is not None else len(answer)
+            review = answer[marker.end() : end].strip()
+            if filename in reviews or not review:
+                return None
+            reviews[filename] = review
+
+        if set(reviews) != set(filenames):
+            return None
+        return reviews
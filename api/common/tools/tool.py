@@ -3,10 +3,10 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Any, runtime_checkable
+from typing import TYPE_CHECKING, Any, Self, runtime_checkable
 
 import yaml
-from jinja2 import Environment, StrictUndefined
+from jinja2 import Environment, StrictUndefined, Template
 from typing_extensions import Protocol
 
 from configs.tools import CHAT_CONFIG_DIRECTORY
@@ -49,6 +49,51 @@ def get_tool_config_path(tool: Tools) -> Path:
     return CHAT_CONFIG_DIRECTORY / f"{tool}" / "main.yaml"
 
 
+class PromptTemplateRegistry:
+    """Compiled prompt templates of all tools.
+
+    Templates are compiled once by a single shared Jinja2 environment and only
+    recompiled when their file changes on disk.
+    """
+
+    def __init__(self: Self) -> None:
+        """Initialize an empty registry."""
+        # Raise error when undefined and escape special characters.
+        self._environment = Environment(undefined=StrictUndefined, autoescape=True)
+        self._templates: dict[Path, tuple[float, dict[str, Template]]] = {}
+
+    def load_all(self: Self, config_directory: Path = CHAT_CONFIG_DIRECTORY) -> None:
+        """Compile the templates of all tools.
+
+        :param config_directory: Directory holding the tool configurations.
+        """
+        for template_path in sorted(config_directory.glob("*/main.yaml")):
+            self.get_templates(template_path)
+        logger.info(f"Loaded prompt templates of {len(self._templates)} tools.")
+
+    def get_templates(self: Self, template_path: Path) -> dict[str, Template]:
+        """Get the compiled templates of a tool, recompiling them if they changed.
+
+        :param template_path: path to the YAML file containing the prompts.
+        :return: Compiled template per prompt type.
+        """
+        modified_at = template_path.stat().st_mtime
+        cached = self._templates.get(template_path)
+        if cached is not None and cached[0] == modified_at:
+            return cached[1]
+
+        prompt_templates = yaml.safe_load(template_path.read_text())
+        templates = {
+            prompt_type: self._environment.from_string(prompt_template)
+            for prompt_type, prompt_template in prompt_templates.items()
+        }
+        self._templates[template_path] = (modified_at, templates)
+        return templates
+
+
+prompt_template_registry = PromptTemplateRegistry()
+
+
 def get_hydrated_prompt(
     template_path: Path,
     prompt_type: PromptType,
@@ -60,16 +105,7 @@ def get_hydrated_prompt(
     :param prompt_type: type of prompt to hydrate.
     :return: A Box configuration with the tool's prompts.
     """
-    # Read the YAML file
-    prompt_templates = yaml.safe_load(template_path.read_text())
-    prompt_template = prompt_templates[prompt_type]
-
-    # Initialize the Jinja2 environment
-    # (raise error when undefined and escape special characters).
-    environment = Environment(undefined=StrictUndefined, autoescape=True)
-
-    # Render the Jinja2 template.
-    jinja_template = environment.from_string(prompt_template)
+    jinja_template = prompt_template_registry.get_templates(template_path)[prompt_type]
     return jinja_template.render(**kwargs)
 
 
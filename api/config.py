@@ -1,5 +1,8 @@
 """Module to store the API's global config."""
 
+import logging
+from typing import Callable
+
 from dotenv import load_dotenv
 
 from api.utils.config import load_config
@@ -16,3 +19,37 @@ config = load_config(
         general_config_path,
     ],
 )
+
+logger = logging.getLogger(__name__)
+
+_reload_hooks: list[Callable[[], None]] = []
+
+
+def register_reload_hook(hook: Callable[[], None]) -> None:
+    """Register a function to call after the configuration is reloaded.
+
+    Use this to invalidate anything built from the configuration.
+
+    :param hook: Function to call.
+    """
+    _reload_hooks.append(hook)
+
+
+def reload_config() -> None:
+    """Reload the configuration from disk.
+
+    The configuration is updated in place, such that modules holding a reference
+    to it see the new values.
+    """
+    load_dotenv(override=True)
+    reloaded_config = load_config(
+        [
+            general_config_path,
+        ],
+    )
+    config.clear()
+    config.update(reloaded_config)
+
+    logger.info("Configuration reloaded.")
+    for hook in _reload_hooks:
+        hook()
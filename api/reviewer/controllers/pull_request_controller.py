@@ -1,31 +1,66 @@
 """Controller for pull request related operations."""
 
+from typing import AsyncIterator
+
+from api.common.models.page import Page
 from api.reviewer.dto.responses import ReviewResponse
 from api.reviewer.models.pull_request import PullRequest
-from api.reviewer.models.repository import Repository
-from api.reviewer.models.review import Review
+from api.reviewer.models.repository import FileFilterConfig, Repository
+from api.reviewer.models.review import Review, ReviewEvent, ReviewStatus
 from api.reviewer.services import pull_request_service
 
 
 async def create_review(
     repository_id: int,
     pull_request_id: int,
-) -> ReviewResponse:
-    """Create a review.
-
-    :param repository: The repository name ($OWNER/$REPOSITORY_NAME).
-    :param pull_request_number: The pull request number.
-    :return: The review ID.
+    *,
+    incremental: bool = False,
+) -> Review:
+    """Create a review job.
+
+    :param repository_id: The repository ID.
+    :param pull_request_id: The pull request ID.
+    :param incremental: Whether to only review files changed since the last review.
+    :return: The queued review.
     """
     return await pull_request_service.create_review(
         repository_id=repository_id,
         pull_request_id=pull_request_id,
+        incremental=incremental,
+    )
+
+
+async def stream_review(
+    repository_id: int,
+    pull_request_id: int,
+    *,
+    incremental: bool = False,
+) -> AsyncIterator[ReviewEvent]:
+    """Create a review and stream its events.
+
+    :param repository_id: The repository ID.
+    :param pull_request_id: The pull request ID.
+    :param incremental: Whether to only review files changed since the last review.
+    :return: Iterator over the review events.
+    """
+    return await pull_request_service.stream_review(
+        repository_id=repository_id,
+        pull_request_id=pull_request_id,
+        incremental=incremental,
     )
 
 
-async def list_repositories() -> list[Repository]:
-    """List repositories."""
-    return await pull_request_service.list_repositories()
+async def list_repositories(
+    limit: int,
+    after: int | None = None,
+    repository_name: str | None = None,
+) -> Page[Repository]:
+    """List a page of repositories."""
+    return await pull_request_service.list_repositories(
+        limit=limit,
+        after=after,
+        repository_name=repository_name,
+    )
 
 
 async def get_repository(repository_id: int) -> Repository:
@@ -41,11 +76,24 @@ async def delete_repository(repository_id: int) -> None:
 async def add_repository(
     repository_name: str,
     github_url: str | None = None,
+    file_filter: FileFilterConfig | None = None,
 ) -> Repository:
     """Add a repository."""
     return await pull_request_service.add_repository(
         repository_name=repository_name,
         github_url=github_url,
+        file_filter=file_filter,
+    )
+
+
+async def update_file_filter(
+    repository_id: int,
+    file_filter: FileFilterConfig | None,
+) -> None:
+    """Update the file filter of a repository."""
+    return await pull_request_service.update_file_filter(
+        repository_id=repository_id,
+        file_filter=file_filter,
     )
 
 
@@ -60,9 +108,17 @@ async def add_pull_request(
     )
 
 
-async def get_pull_requests(repository_id: int) -> list[PullRequest]:
-    """Get a list of pull requests."""
-    return await pull_request_service.get_pull_requests(repository_id=repository_id)
+async def get_pull_requests(
+    repository_id: int,
+    limit: int,
+    after: int | None = None,
+) -> Page[PullRequest]:
+    """Get a page of pull requests."""
+    return await pull_request_service.get_pull_requests(
+        repository_id=repository_id,
+        limit=limit,
+        after=after,
+    )
 
 
 async def get_pull_request(
@@ -79,11 +135,30 @@ async def get_pull_request(
 async def get_reviews(
     repository_id: int,
     pull_request_id: int,
-) -> list[Review]:
-    """Get a list of reviews."""
+    limit: int,
+    after: int | None = None,
+    review_status: ReviewStatus | None = None,
+) -> Page[Review]:
+    """Get a page of reviews."""
     return await pull_request_service.get_reviews(
         repository_id=repository_id,
         pull_request_id=pull_request_id,
+        limit=limit,
+        after=after,
+        review_status=review_status,
+    )
+
+
+async def get_review_status(
+    repository_id: int,
+    pull_request_id: int,
+    review_id: int,
+) -> Review:
+    """Get the status of a review."""
+    return await pull_request_service.get_review_status(
+        repository_id=repository_id,
+        pull_request_id=pull_request_id,
+        review_id=review_id,
     )
 
 
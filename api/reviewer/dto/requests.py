@@ -2,6 +2,8 @@
 
 from pydantic import BaseModel, Field
 
+from api.reviewer.models.repository import FileFilterConfig
+
 
 class RegisterPRRequest(BaseModel):
     """Request DTO for registering a PR."""
@@ -14,3 +16,4 @@ class AddRepositoryRequest(BaseModel):
 
     repository_name: str
     github_url: str = Field(default="https://github.com")
+    file_filter: FileFilterConfig | None = None
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from api.reviewer.models.review import FileReviewStatus, ReviewStatus
+
 
 class ReviewResponse(BaseModel):
     """Resposne for a review."""
@@ -7,3 +9,15 @@ class ReviewResponse(BaseModel):
     review_id: int
     review_contents: list[str]
     file_names: list[str]
+    file_statuses: list[FileReviewStatus] = []
+    status: ReviewStatus = ReviewStatus.done
+
+
+class ReviewStatusResponse(BaseModel):
+    """Response for the status of a review job."""
+
+    review_id: int
+    status: ReviewStatus
+    files_done: int
+    files_total: int
+    failure_reason: str | None = None
@@ -30,3 +30,39 @@ class PullRequestFileChanges(BaseModel):
     additions: int
     deletions: int
     changes: int
+
+
+class PullRequestSnapshot(BaseModel):
+    """Last known file changes of a pull request.
+
+    Attributes
+    ----------
+    - pull_request_id: The pull request ID.
+    - etag: Github's ETag of the pull request.
+    - last_modified: Github's Last-Modified date of the pull request.
+    - base_sha: The SHA of the base commit.
+    - head_sha: The SHA of the head commit.
+    - file_changes: The changes made to the files of the pull request.
+    """
+
+    pull_request_id: int
+    etag: str | None = None
+    last_modified: str | None = None
+    base_sha: str | None = None
+    head_sha: str | None = None
+    file_changes: list[PullRequestFileChanges]
+
+
+class PullRequestFilesPage(BaseModel):
+    """A page of the changed files of a pull request at a given revision.
+
+    Attributes
+    ----------
+    - base_sha: The SHA of the base commit, if known.
+    - head_sha: The SHA of the head commit, if known.
+    - file_changes: The changes made to the files of the page.
+    """
+
+    base_sha: str | None = None
+    head_sha: str | None = None
+    file_changes: list[PullRequestFileChanges]
@@ -1,6 +1,50 @@
 """Module for the repository model."""
 
-from pydantic import BaseModel
+from __future__ import annotations
+
+import re
+
+from pydantic import BaseModel, field_validator
+
+
+class FileFilterConfig(BaseModel):
+    """Which changed files of a repository are reviewed, on top of the defaults.
+
+    Attributes
+    ----------
+    - exclude: Glob patterns of paths to skip.
+    - exclude_regex: Regular expressions searched in paths to skip.
+    - include: Glob patterns of paths to review even if excluded.
+    - max_changes: Changed lines above which a file is skipped, if not the default.
+    """
+
+    exclude: list[str] = []
+    exclude_regex: list[str] = []
+    include: list[str] = []
+    max_changes: int | None = None
+
+    @field_validator("exclude_regex")
+    @classmethod
+    def validate_exclude_regex(
+        cls: type[FileFilterConfig],
+        patterns: list[str],
+    ) -> list[str]:
+        """Reject regular expressions that do not compile.
+
+        Otherwise they would only fail once files are filtered, failing every
+        review of the repository.
+
+        :param patterns: The regular expressions.
+        :raises ValueError: If a regular expression does not compile.
+        :return: The regular expressions.
+        """
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                message = f"Invalid regular expression {pattern!r}: {e}."
+                raise ValueError(message) from e
+        return patterns
 
 
 class Repository(BaseModel):
@@ -9,3 +53,4 @@ class Repository(BaseModel):
     id: int
     github_url: str
     repository_name: str
+    file_filter: FileFilterConfig | None = None
@@ -1,8 +1,21 @@
 """Models for a PR review."""
 
+from datetime import datetime
+from enum import StrEnum, auto
+
 from pydantic import BaseModel
 
 
+class ReviewStatus(StrEnum):
+    """Status of a review job."""
+
+    queued = auto()
+    running = auto()
+    partial = auto()
+    done = auto()
+    failed = auto()
+
+
 class Review(BaseModel):
     """A PR review.
 
@@ -10,13 +23,94 @@ class Review(BaseModel):
     ----------
     - id: The review ID.
     - pull_request_id: The Pull Request ID.
-    - content: The review content.
+    - status: The status of the review job.
+    - files_total: The number of files to review.
+    - files_done: The number of files processed so far, failed or not, such
+      that it reaches files_total once the review is finished.
+    - base_sha: The SHA of the base commit of the reviewed revision.
+    - head_sha: The SHA of the head commit of the reviewed revision.
+    - failure_reason: Why the review, or some of its files, failed.
     """
 
     id: int
     pull_request_id: int
+    status: ReviewStatus = ReviewStatus.done
+    files_total: int = 0
+    files_done: int = 0
+    base_sha: str | None = None
+    head_sha: str | None = None
+    failure_reason: str | None = None
 
     class Config:
         """Config class."""
 
         from_attributes = True
+
+
+class FileReviewStatus(StrEnum):
+    """Status of the review of a single file."""
+
+    done = auto()
+    rejected = auto()
+    skipped = auto()
+    failed = auto()
+
+
+class FileReview(BaseModel):
+    """A review of a single file.
+
+    Attributes
+    ----------
+    - file_name: The name of the reviewed file.
+    - content: The review content, unless carried over from an earlier review.
+    - carried_over_from_id: The ID of the earlier file review this one refers to.
+    - status: The status of the file review.
+    - reason: Why the file was not reviewed, if it was not.
+    - position: The position of the file in the pull request.
+    - started_at: When the review of the file started.
+    - finished_at: When the review of the file finished.
+    """
+
+    file_name: str
+    content: str | None = None
+    carried_over_from_id: int | None = None
+    status: FileReviewStatus = FileReviewStatus.done
+    reason: str | None = None
+    position: int | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class ReviewEventType(StrEnum):
+    """Type of event emitted while a review is running."""
+
+    review_started = auto()
+    token = auto()
+    file_done = auto()
+    file_carried_over = auto()
+    file_rejected = auto()
+    file_skipped = auto()
+    file_failed = auto()
+    review_done = auto()
+
+
+class ReviewEvent(BaseModel):
+    """An event emitted while a review is running.
+
+    Attributes
+    ----------
+    - type: The type of event.
+    - review_id: The review ID.
+    - file_name: The file the event relates to, if any.
+    - part: The part of the file a token event relates to, if it is split.
+    - content: The review tokens of a token event, why a file was rejected,
+      skipped or failed, or why a review_done event's review failed.
+    - status: The review status of a review_done event.
+    """
+
+    type: ReviewEventType
+    review_id: int
+    file_name: str | None = None
+    part: int | None = None
+    content: str | None = None
+    status: ReviewStatus | None = None
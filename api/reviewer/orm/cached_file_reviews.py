@@ -0,0 +1,23 @@
+"""ORM for cached file reviews."""
+
+from typing import ClassVar
+
+from sqlalchemy import Column, DateTime, String, func
+
+from api.common.orm.base import Base
+from api.config import config
+
+
+class CachedFileReviews(Base):
+    """File reviews, addressed by a hash of everything that went into them."""
+
+    __tablename__: str = "cachedfilereviews"
+    __table_args__: ClassVar = {"schema": config.database.reviewer.app}
+
+    key = Column(String(64), primary_key=True)
+    content = Column(String, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
@@ -0,0 +1,37 @@
+"""ORM for snapshots of pull requests fetched from Github."""
+
+from typing import ClassVar
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, func
+from sqlalchemy.orm.properties import ForeignKey
+
+from api.common.orm.base import Base
+from api.config import config
+
+
+class PullRequestSnapshots(Base):
+    """Last known file changes of a pull request, with Github's validators."""
+
+    __tablename__: str = "pullrequestsnapshots"
+    __table_args__: ClassVar = {"schema": config.database.reviewer.app}
+
+    pull_request_id = Column(
+        Integer,
+        ForeignKey(
+            f"{config.database.reviewer.app}.pullrequests.id",
+            ondelete="CASCADE",
+        ),
+        primary_key=True,
+    )
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    base_sha = Column(String, nullable=True)
+    head_sha = Column(String, nullable=True)
+    # zlib-compressed JSON list of the file changes.
+    file_changes = Column(LargeBinary, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
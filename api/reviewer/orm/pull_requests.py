@@ -2,7 +2,7 @@
 
 from typing import ClassVar
 
-from sqlalchemy import Column, Integer
+from sqlalchemy import Column, Index, Integer, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.properties import ForeignKey
 
@@ -14,7 +14,15 @@ class PullRequests(Base):
     """ORM for pull requests."""
 
     __tablename__: str = "pullrequests"
-    __table_args__: ClassVar = {"schema": config.database.reviewer.app}
+    __table_args__: ClassVar = (
+        Index("ix_pullrequests_repository_id_id", "repository_id", "id"),
+        UniqueConstraint(
+            "repository_id",
+            "pull_request_number",
+            name="uq_pullrequests_repository_id_pull_request_number",
+        ),
+        {"schema": config.database.reviewer.app},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     repository_id = Column(
@@ -2,7 +2,7 @@
 
 from typing import ClassVar
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import JSON, Column, Integer, String
 from sqlalchemy.orm import relationship
 
 from api.common.orm.base import Base
@@ -22,5 +22,7 @@ class Repositories(Base):
         default="api.github.com",
     )  # github.yourcompany.com/api/v3 for enterprise
     repository_name = Column(String, nullable=False)
+    # Which changed files are reviewed, on top of the configured defaults.
+    file_filter = Column(JSON, nullable=True)
 
     pull_requests = relationship("PullRequests", back_populates="repository")
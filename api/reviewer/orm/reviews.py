@@ -2,41 +2,77 @@
 
 from typing import ClassVar
 
-from sqlalchemy import Column, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.orm.properties import ForeignKey
 
 from api.common.orm.base import Base
 from api.config import config
+from api.reviewer.models.review import FileReviewStatus, ReviewStatus
 
 
 class Reviews(Base):
     """ORM for reviews."""
 
     __tablename__: str = "reviews"
-    __table_args__: ClassVar = {"schema": config.database.reviewer.app}
+    __table_args__: ClassVar = (
+        Index("ix_reviews_pull_request_id_id", "pull_request_id", "id"),
+        {"schema": config.database.reviewer.app},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     pull_request_id = Column(
         Integer,
         ForeignKey(f"{config.database.reviewer.app}.pullrequests.id"),
     )
+    status = Column(String, nullable=False, default=ReviewStatus.queued)
+    files_total = Column(Integer, nullable=False, default=0)
+    files_done = Column(Integer, nullable=False, default=0)
+    base_sha = Column(String, nullable=True)
+    head_sha = Column(String, nullable=True)
+    failure_reason = Column(String, nullable=True)
+
     pull_request = relationship("PullRequests", back_populates="reviews")
-    file_reviews = relationship("FileReviews", back_populates="review")
+    # File reviews are persisted as they complete, and listed in pull request
+    # order.
+    file_reviews = relationship(
+        "FileReviews",
+        back_populates="review",
+        order_by="[FileReviews.position, FileReviews.id]",
+    )
 
 
 class FileReviews(Base):
     """Reviews for files."""
 
     __tablename__: str = "filereviews"
-    __table_args__: ClassVar = {"schema": config.database.reviewer.app}
+    __table_args__: ClassVar = (
+        Index("ix_filereviews_review_id", "review_id"),
+        {"schema": config.database.reviewer.app},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     review_id = Column(
         Integer,
         ForeignKey(f"{config.database.reviewer.app}.reviews.id"),
     )
-    content = Column(String, nullable=False)
+    # Null if the review is carried over from an earlier file review, or if its
+    # content is compressed. Both are only loaded on access, see undefer_group.
+    content = deferred(Column(String, nullable=True), group="content")
+    # zstd-compressed content.
+    content_zstd = deferred(Column(LargeBinary, nullable=True), group="content")
     file_name = Column(String, nullable=False)
+    carried_over_from_id = Column(
+        Integer,
+        ForeignKey(f"{config.database.reviewer.app}.filereviews.id"),
+        nullable=True,
+    )
+    status = Column(String, nullable=False, default=FileReviewStatus.done)
+    reason = Column(String, nullable=True)
+    # Position of the file in the pull request.
+    position = Column(Integer, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
 
     review = relationship("Reviews", back_populates="file_reviews")
+    carried_over_from = relationship("FileReviews", remote_side=[id])
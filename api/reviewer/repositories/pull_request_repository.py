@@ -1,33 +1,82 @@
-from sqlalchemy import delete, select
-from sqlalchemy.orm import selectinload
+import json
+import zlib
+from collections import Counter
 
+from fastapi import HTTPException, status
+from sqlalchemy import Select, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, selectinload
+
+from api.common.models.page import Page
+from api.config import config
 from api.reviewer.dto.responses import ReviewResponse
-from api.reviewer.models.pull_request import PullRequest
-from api.reviewer.models.repository import Repository
-from api.reviewer.models.review import Review
+from api.reviewer.models.pull_request import (
+    PullRequest,
+    PullRequestFileChanges,
+    PullRequestSnapshot,
+)
+from api.reviewer.models.repository import FileFilterConfig, Repository
+from api.reviewer.models.review import (
+    FileReview,
+    FileReviewStatus,
+    Review,
+    ReviewStatus,
+)
+from api.reviewer.orm.cached_file_reviews import CachedFileReviews
+from api.reviewer.orm.pull_request_snapshots import PullRequestSnapshots
 from api.reviewer.orm.pull_requests import PullRequests
 from api.reviewer.orm.repositories import Repositories
 from api.reviewer.orm.reviews import FileReviews, Reviews
+from api.utils.compression import get_file_review_codec
 from api.utils.database import database_session, orm_to_pydantic
+from api.utils.pagination import fetch_page
+
 
+async def list_repositories(
+    limit: int,
+    after: int | None = None,
+    repository_name: str | None = None,
+) -> Page[Repository]:
+    """List a page of repositories.
 
-async def list_repositories() -> list[Repository]:
-    """List repositories."""
+    :param limit: The maximum number of repositories on the page.
+    :param after: The repository ID to start after, or None for the first page.
+    :param repository_name: Only list repositories whose name starts with this.
+    :return: The page of repositories.
+    """
     async with database_session() as session:
-        result = await session.execute(select(Repositories))
-        repositories = result.scalars().all()
-        return [orm_to_pydantic(repository, Repository) for repository in repositories]
+        return await fetch_page(
+            session,
+            select_repositories(repository_name=repository_name),
+            id_column=Repositories.id,
+            pydantic_class=Repository,
+            limit=limit,
+            after=after,
+        )
+
+
+def select_repositories(repository_name: str | None = None) -> Select:
+    """Select repositories, optionally those whose name starts with a prefix."""
+    statement = select(Repositories)
+    if repository_name:
+        statement = statement.where(
+            Repositories.repository_name.startswith(repository_name, autoescape=True),
+        )
+    return statement
 
 
 async def add_repository(
     repository_name: str,
     github_url: str | None = None,
+    file_filter: FileFilterConfig | None = None,
 ) -> Repository:
     """Add a repository."""
     async with database_session() as session:
         new_repository = Repositories(
             repository_name=repository_name,
             github_url=github_url,
+            file_filter=file_filter.model_dump() if file_filter else None,
         )
         session.add(new_repository)
         await session.commit()
@@ -44,6 +93,20 @@ async def delete_repository(repository_id: int) -> None:
         await session.commit()
 
 
+async def update_file_filter(
+    repository_id: int,
+    file_filter: FileFilterConfig | None,
+) -> None:
+    """Update the file filter of a repository."""
+    async with database_session() as session:
+        await session.execute(
+            update(Repositories)
+            .where(Repositories.id == repository_id)
+            .values(file_filter=file_filter.model_dump() if file_filter else None),
+        )
+        await session.commit()
+
+
 async def get_repository(repository_id: int) -> Repository:
     """Get a repository."""
     async with database_session() as session:
@@ -65,21 +128,43 @@ async def add_pull_request(
             pull_request_number=pull_request_number,
         )
         session.add(new_pull_request)
-        await session.commit()
+        try:
+            await session.commit()
+        except IntegrityError as e:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Pull request {pull_request_number} is already registered.",
+            ) from e
         await session.refresh(new_pull_request)
         return orm_to_pydantic(new_pull_request, PullRequest)
 
 
-async def get_pull_requests(repository_id: int) -> list[PullRequest]:
-    """Get a list of pull requests."""
+async def get_pull_requests(
+    repository_id: int,
+    limit: int,
+    after: int | None = None,
+) -> Page[PullRequest]:
+    """Get a page of the pull requests of a repository.
+
+    :param repository_id: The repository ID.
+    :param limit: The maximum number of pull requests on the page.
+    :param after: The pull request ID to start after, or None for the first page.
+    :return: The page of pull requests.
+    """
     async with database_session() as session:
-        result = await session.execute(
-            select(PullRequests).where(PullRequests.repository_id == repository_id),
+        return await fetch_page(
+            session,
+            select_pull_requests(repository_id=repository_id),
+            id_column=PullRequests.id,
+            pydantic_class=PullRequest,
+            limit=limit,
+            after=after,
         )
-        pull_requests = result.scalars().all()
-        return [
-            orm_to_pydantic(pull_request, PullRequest) for pull_request in pull_requests
-        ]
+
+
+def select_pull_requests(repository_id: int) -> Select:
+    """Select the pull requests of a repository."""
+    return select(PullRequests).where(PullRequests.repository_id == repository_id)
 
 
 async def get_pull_request(
@@ -95,11 +180,85 @@ async def get_pull_request(
         return orm_to_pydantic(pull_request, PullRequest)
 
 
-async def add_review(pull_request_id: int) -> Review:
+async def get_pull_request_snapshot(
+    pull_request_id: int,
+) -> PullRequestSnapshot | None:
+    """Get the last known file changes of a pull request, if any."""
+    async with database_session() as session:
+        result = await session.execute(
+            select(PullRequestSnapshots).where(
+                PullRequestSnapshots.pull_request_id == pull_request_id,
+            ),
+        )
+        snapshot = result.scalar()
+        if snapshot is None:
+            return None
+
+        file_changes = json.loads(zlib.decompress(snapshot.file_changes))
+        return PullRequestSnapshot(
+            pull_request_id=snapshot.pull_request_id,
+            etag=snapshot.etag,
+            last_modified=snapshot.last_modified,
+            base_sha=snapshot.base_sha,
+            head_sha=snapshot.head_sha,
+            file_changes=[PullRequestFileChanges(**file) for file in file_changes],
+        )
+
+
+async def save_pull_request_snapshot(snapshot: PullRequestSnapshot) -> None:
+    """Save the last known file changes of a pull request, replacing older ones."""
+    values = {
+        "etag": snapshot.etag,
+        "last_modified": snapshot.last_modified,
+        "base_sha": snapshot.base_sha,
+        "head_sha": snapshot.head_sha,
+        "file_changes": zlib.compress(
+            json.dumps(
+                [file.model_dump() for file in snapshot.file_changes],
+            ).encode("utf-8"),
+        ),
+    }
+    async with database_session() as session:
+        await session.execute(
+            insert(PullRequestSnapshots)
+            .values(pull_request_id=snapshot.pull_request_id, **values)
+            .on_conflict_do_update(
+                index_elements=[PullRequestSnapshots.pull_request_id],
+                set_={**values, "updated_at": func.now()},
+            ),
+        )
+        await session.commit()
+
+
+async def get_cached_file_review(key: str) -> str | None:
+    """Get the content of a cached file review, if any."""
+    async with database_session() as session:
+        result = await session.execute(
+            select(CachedFileReviews.content).where(CachedFileReviews.key == key),
+        )
+        return result.scalar()
+
+
+async def add_cached_file_review(key: str, content: str) -> None:
+    """Cache the content of a file review."""
+    async with database_session() as session:
+        await session.execute(
+            insert(CachedFileReviews)
+            .values(key=key, content=content)
+            .on_conflict_do_nothing(index_elements=[CachedFileReviews.key]),
+        )
+        await session.commit()
+
+
+async def add_review(
+    pull_request_id: int,
+    status: ReviewStatus = ReviewStatus.queued,
+) -> Review:
     """Add a review."""
     async with database_session() as session:
         new_review = Reviews(
             pull_request_id=pull_request_id,
+            status=status,
         )
         session.add(new_review)
         await session.commit()
@@ -107,37 +266,198 @@ async def add_review(pull_request_id: int) -> Review:
         return orm_to_pydantic(new_review, Review)
 
 
-async def add_file_review(
+async def update_review(
     review_id: int,
-    review_contents: list[str],
-    file_names: list[str],
+    status: ReviewStatus | None = None,
+    files_total: int | None = None,
+    base_sha: str | None = None,
+    head_sha: str | None = None,
+    failure_reason: str | None = None,
 ) -> None:
-    """Add file reviews."""
-    async with database_session() as session:
-        file_reviews = []
-        for review_content, file_name in zip(review_contents, file_names):
-            file_review = FileReviews(
-                review_id=review_id,
-                content=review_content,
-                file_name=file_name,
-            )
-            file_reviews.append(file_review)
+    """Update the status, number of files, revision or failure reason of a review."""
+    values = {
+        key: value
+        for key, value in (
+            ("status", status),
+            ("files_total", files_total),
+            ("base_sha", base_sha),
+            ("head_sha", head_sha),
+            ("failure_reason", failure_reason),
+        )
+        if value is not None
+    }
+    if not values:
+        return
 
-        session.add_all(file_reviews)
+    async with database_session() as session:
+        await session.execute(
+            update(Reviews).where(Reviews.id == review_id).values(**values),
+        )
         await session.commit()
 
 
+async def add_file_reviews(file_reviews: list[tuple[int, FileReview]]) -> None:
+    """Add file reviews and count them as done, atomically.
+
+    Failed file reviews count as done too, such that the progress of a review
+    reaches its total; the status of the review tells whether files failed.
+
+    :param file_reviews: The file reviews, each with the ID of its review.
+    """
+    files_done = Counter(review_id for review_id, _ in file_reviews)
+    async with database_session() as session:
+        await session.execute(
+            insert(FileReviews),
+            [
+                {
+                    "review_id": review_id,
+                    **_get_content_values(file_review.content),
+                    "file_name": file_review.file_name,
+                    "carried_over_from_id": file_review.carried_over_from_id,
+                    "status": file_review.status,
+                    "reason": file_review.reason,
+                    "position": file_review.position,
+                    "started_at": file_review.started_at,
+                    "finished_at": file_review.finished_at,
+                }
+                for review_id, file_review in file_reviews
+            ],
+        )
+        for review_id, count in files_done.items():
+            await session.execute(
+                update(Reviews)
+                .where(Reviews.id == review_id)
+                .values(files_done=Reviews.files_done + count),
+            )
+        await session.commit()
+
+
+def _get_content_values(content: str | None) -> dict[str, str | bytes | None]:
+    """Get the column values storing the content of a file review.
+
+    :param content: The content.
+    :return: The content, compressed if configured.
+    """
+    codec = get_file_review_codec()
+    if (
+        content is None
+        or codec is None
+        or config.file_review_storage.compression != "zstd"
+    ):
+        return {"content": content, "content_zstd": None}
+    return {"content": None, "content_zstd": codec.compress(content)}
+
+
+def get_file_review_content(file_review: FileReviews) -> str | None:
+    """Get the content of a file review, decompressing it if needed.
+
+    :param file_review: The file review, with its content loaded.
+    :return: The content.
+    :raises RuntimeError: If the content is compressed and zstandard is missing.
+    """
+    if file_review.content_zstd is None:
+        return file_review.content
+    codec = get_file_review_codec()
+    if codec is None:
+        message = "Compressed file reviews require the zstandard package."
+        raise RuntimeError(message)
+    return codec.decompress(file_review.content_zstd)
+
+
+async def get_previous_review(
+    pull_request_id: int,
+    review_id: int,
+) -> tuple[Review, dict[str, int]] | None:
+    """Get the latest completed review of a revision before a given review.
+
+    :param pull_request_id: The pull request ID.
+    :param review_id: The ID of the review to look before.
+    :return: The previous review and, per file name, the ID of the file review
+        holding its content. None if there is no previous review.
+    """
+    async with database_session() as session:
+        result = await session.execute(
+            select(Reviews)
+            .options(selectinload(Reviews.file_reviews))
+            .where(
+                Reviews.pull_request_id == pull_request_id,
+                Reviews.id < review_id,
+                Reviews.head_sha.is_not(None),
+                Reviews.status.in_([ReviewStatus.done, ReviewStatus.partial]),
+            )
+            .order_by(Reviews.id.desc())
+            .limit(1),
+        )
+        review = result.scalar()
+        if review is None:
+            return None
+
+        # Point to the file review holding the content, such that carried over
+        # reviews never chain.
+        file_review_ids = {
+            file_review.file_name: file_review.carried_over_from_id or file_review.id
+            for file_review in review.file_reviews
+            if file_review.status == FileReviewStatus.done
+        }
+        return orm_to_pydantic(review, Review), file_review_ids
+
+
 async def get_reviews(
     repository_id: int,
     pull_request_id: int,
-) -> list[Review]:
-    """Get a list of reviews."""
+    limit: int,
+    after: int | None = None,
+    review_status: ReviewStatus | None = None,
+) -> Page[Review]:
+    """Get a page of the reviews of a pull request.
+
+    :param repository_id: The repository ID.
+    :param pull_request_id: The pull request ID.
+    :param limit: The maximum number of reviews on the page.
+    :param after: The review ID to start after, or None for the first page.
+    :param review_status: Only list reviews with this status.
+    :return: The page of reviews.
+    """
+    async with database_session() as session:
+        return await fetch_page(
+            session,
+            select_reviews(
+                pull_request_id=pull_request_id,
+                review_status=review_status,
+            ),
+            id_column=Reviews.id,
+            pydantic_class=Review,
+            limit=limit,
+            after=after,
+        )
+
+
+def select_reviews(
+    pull_request_id: int,
+    review_status: ReviewStatus | None = None,
+) -> Select:
+    """Select the reviews of a pull request, optionally those with a status."""
+    statement = select(Reviews).where(Reviews.pull_request_id == pull_request_id)
+    if review_status is not None:
+        statement = statement.where(Reviews.status == review_status)
+    return statement
+
+
+async def get_review_status(
+    repository_id: int,
+    pull_request_id: int,
+    review_id: int,
+) -> Review:
+    """Get a review without its file reviews."""
     async with database_session() as session:
         result = await session.execute(
-            select(Reviews).where(Reviews.pull_request_id == pull_request_id),
+            select(Reviews).where(Reviews.id == review_id),
         )
-        reviews = result.scalars().all()
-        return [orm_to_pydantic(review, Review) for review in reviews]
+        review = result.scalar()
+        if review is None:
+            message = f"Review with id {review_id} not found."
+            raise ValueError(message)
+        return orm_to_pydantic(review, Review)
 
 
 async def get_review(
@@ -145,12 +465,20 @@ async def get_review(
     pull_request_id: int,
     review_id: int,
 ) -> ReviewResponse:
-    """Get a review."""
+    """Get a review.
+
+    This is the only query loading the contents of file reviews, list and
+    metadata queries leave them out.
+    """
     async with database_session() as session:
+        file_reviews = selectinload(Reviews.file_reviews)
         result = await session.execute(
             select(Reviews)
             .options(
-                selectinload(Reviews.file_reviews),
+                file_reviews.undefer_group("content"),
+                file_reviews.selectinload(FileReviews.carried_over_from).undefer_group(
+                    "content",
+                ),
             )
             .where(Reviews.id == review_id),
         )
@@ -158,12 +486,21 @@ async def get_review(
         if review is None:
             message = f"Review with id {review_id} not found."
             raise ValueError(message)
-        review_contents = [file_review.content for file_review in review.file_reviews]
+        # Files that were not reviewed show why instead.
+        review_contents = [
+            get_file_review_content(file_review.carried_over_from or file_review)
+            or file_review.reason
+            or ""
+            for file_review in review.file_reviews
+        ]
         file_names = [file_review.file_name for file_review in review.file_reviews]
+        file_statuses = [file_review.status for file_review in review.file_reviews]
         return ReviewResponse(
             review_id=review.id,
             review_contents=review_contents,
             file_names=file_names,
+            file_statuses=file_statuses,
+            status=review.status,
         )
 
 
@@ -174,6 +511,21 @@ async def delete_review(
 ) -> None:
     """Delete a review."""
     async with database_session() as session:
+        # Later reviews may carry over file reviews of this one; give them a
+        # copy of the content before it goes.
+        carried_over_from = aliased(FileReviews)
+        await session.execute(
+            update(FileReviews)
+            .where(
+                FileReviews.carried_over_from_id == carried_over_from.id,
+                carried_over_from.review_id == review_id,
+            )
+            .values(
+                content=carried_over_from.content,
+                content_zstd=carried_over_from.content_zstd,
+                carried_over_from_id=None,
+            ),
+        )
         await session.execute(
             delete(FileReviews).where(FileReviews.review_id == review_id),
         )
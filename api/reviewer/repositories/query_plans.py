@@ -0,0 +1,174 @@
+"""Check that the hot queries are answered from the indexes meant for them.
+
+Run against a migrated database with
+`python -m api.reviewer.repositories.query_plans`. Sequential scans are disabled
+while the queries are planned, such that small tables do not hide a missing
+index. That alone proves little, since any index may be used instead, e.g. the
+primary key to read a list in order. Hence every query must be answered from
+its own index, looking up its column rather than filtering the rows on it.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import sys
+from typing import Any
+
+from sqlalchemy import Select, select, text
+from sqlalchemy.dialects import postgresql
+
+from api.common.orm.users import Users
+from api.config import config
+from api.reviewer.models.review import ReviewStatus
+from api.reviewer.orm.pull_requests import PullRequests
+from api.reviewer.orm.repositories import Repositories
+from api.reviewer.orm.reviews import FileReviews, Reviews
+from api.reviewer.repositories.pull_request_repository import (
+    select_pull_requests,
+    select_repositories,
+    select_reviews,
+)
+from api.utils.database import database_session
+from api.utils.pagination import get_page_statement
+
+logger = logging.getLogger(__name__)
+
+
+def get_checked_queries() -> dict[str, tuple[Select, str, str | None]]:
+    """Get the queries to check, by name.
+
+    :return: Per query, the statement, the index it must be answered from and
+        the column the index must look up, if any.
+    """
+    limit = config.pagination.default_limit
+    return {
+        "list_repositories": (
+            get_page_statement(
+                select_repositories(),
+                id_column=Repositories.id,
+                limit=limit,
+                after=1,
+            ),
+            "repositories_pkey",
+            None,
+        ),
+        "get_pull_requests": (
+            get_page_statement(
+                select_pull_requests(repository_id=1),
+                id_column=PullRequests.id,
+                limit=limit,
+                after=1,
+            ),
+            "ix_pullrequests_repository_id_id",
+            "repository_id",
+        ),
+        "get_reviews": (
+            get_page_statement(
+                select_reviews(pull_request_id=1, review_status=ReviewStatus.done),
+                id_column=Reviews.id,
+                limit=limit,
+                after=1,
+            ),
+            "ix_reviews_pull_request_id_id",
+            "pull_request_id",
+        ),
+        "get_review": (
+            select(FileReviews).where(FileReviews.review_id == 1),
+            "ix_filereviews_review_id",
+            "review_id",
+        ),
+        "read_user": (
+            select(Users).where(Users.username == "user"),
+            "ix_users_username",
+            "username",
+        ),
+        "find_pull_request": (
+            select(PullRequests).where(
+                PullRequests.repository_id == 1,
+                PullRequests.pull_request_number == 1,
+            ),
+            "uq_pullrequests_repository_id_pull_request_number",
+            "pull_request_number",
+        ),
+    }
+
+
+def get_plan_nodes(plan: dict[str, Any]) -> list[dict[str, Any]]:
+    """Get all nodes of a query plan.
+
+    :param plan: A node of a query plan in JSON format.
+    :return: The node and all nodes below it.
+    """
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(get_plan_nodes(child))
+    return nodes
+
+
+def get_plan_problems(
+    plan: dict[str, Any],
+    index: str,
+    column: str | None,
+) -> list[str]:
+    """Get why a query plan does not answer a query from its index.
+
+    :param plan: The root node of a query plan in JSON format.
+    :param index: The index the query must be answered from.
+    :param column: The column the index must look up, if any.
+    :return: The problems, empty if there are none.
+    """
+    nodes = get_plan_nodes(plan)
+    problems = [
+        f"scans {node['Relation Name']} sequentially"
+        for node in nodes
+        if node.get("Node Type") == "Seq Scan"
+    ]
+    if index not in {node.get("Index Name") for node in nodes}:
+        problems.append(f"does not use {index}")
+    if column is not None:
+        column_pattern = re.compile(rf"\b{column}\b")
+        problems.extend(
+            f"filters on {column}: {node['Filter']}"
+            for node in nodes
+            if column_pattern.search(node.get("Filter", ""))
+        )
+    return problems
+
+
+async def check_query_plans() -> dict[str, list[str]]:
+    """Plan the checked queries and find those not answered from their index.
+
+    :return: Per query not answered from its index, the problems of its plan.
+    """
+    failures = {}
+    async with database_session() as session:
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, (query, index, column) in get_checked_queries().items():
+            sql = query.compile(
+                dialect=postgresql.dialect(),
+                compile_kwargs={"literal_binds": True},
+            )
+            result = await session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            if problems := get_plan_problems(plan[0]["Plan"], index, column):
+                failures[name] = problems
+        await session.rollback()
+    return failures
+
+
+def main() -> None:
+    """Exit with an error if any checked query is not answered from its index."""
+    logging.basicConfig(level=logging.INFO)
+    failures = asyncio.run(check_query_plans())
+    for name, problems in failures.items():
+        logger.error(f"{name} {', '.join(problems)}.")
+    if not failures:
+        logger.info(f"All {len(get_checked_queries())} queries use their indexes.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Train a zstd dictionary on recent file reviews.
+
+Run against the database with
+`python -m api.reviewer.repositories.review_dictionary`. The dictionary is saved
+in the dictionary directory; new file reviews are compressed with it once its ID
+is configured as file_review_storage.dictionary_id. Keep earlier dictionaries,
+they are still needed to read the reviews compressed with them.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import undefer_group
+
+from api.config import config
+from api.reviewer.orm.reviews import FileReviews
+from api.reviewer.repositories.pull_request_repository import get_file_review_content
+from api.utils.compression import get_file_review_codec, train_dictionary
+from api.utils.database import database_session
+from configs import CONFIGS_DIRECTORY
+
+logger = logging.getLogger(__name__)
+
+
+async def get_recent_contents(limit: int) -> list[str]:
+    """Get the contents of the most recent file reviews.
+
+    :param limit: Number of file reviews to get the contents of.
+    :return: The contents.
+    """
+    async with database_session() as session:
+        result = await session.execute(
+            select(FileReviews)
+            .options(undefer_group("content"))
+            .where(
+                or_(
+                    FileReviews.content.is_not(None),
+                    FileReviews.content_zstd.is_not(None),
+                ),
+            )
+            .order_by(FileReviews.id.desc())
+            .limit(limit),
+        )
+        return [
+            get_file_review_content(file_review) for file_review in result.scalars()
+        ]
+
+
+def main() -> None:
+    """Train a dictionary and log its ID."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    if get_file_review_codec() is None:
+        logger.error("Training a dictionary requires the zstandard package.")
+        sys.exit(1)
+
+    samples = asyncio.run(get_recent_contents(limit=args.samples))
+    dictionary_id = train_dictionary(
+        samples,
+        size=args.size,
+        directory=CONFIGS_DIRECTORY / config.file_review_storage.dictionary_directory,
+    )
+    logger.info(
+        f"Trained dictionary {dictionary_id} on {len(samples)} file reviews, set "
+        f"file_review_storage.dictionary_id to {dictionary_id} to use it.",
+    )
+
+
+if __name__ == "__main__":
+    main()
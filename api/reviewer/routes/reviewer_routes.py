@@ -1,26 +1,38 @@
 """Reviewer routes."""
 
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from starlette.status import HTTP_201_CREATED
 
 from api.common.models.user import User
 from api.common.services.auth_service import get_current_user
+from api.config import config
 from api.reviewer.controllers import pull_request_controller
 from api.reviewer.dto.requests import (
     AddRepositoryRequest,
     RegisterPRRequest,
 )
-from api.reviewer.dto.responses import ReviewResponse
+from api.reviewer.dto.responses import ReviewResponse, ReviewStatusResponse
 from api.reviewer.models.pull_request import PullRequest
-from api.reviewer.models.repository import Repository
-from api.reviewer.models.review import Review
+from api.reviewer.models.repository import FileFilterConfig, Repository
+from api.reviewer.models.review import Review, ReviewStatus
 from api.utils.constants import ApplicationTags
+from api.utils.pagination import get_link_header
+from api.utils.responses import compressed_json_response, json_response
 
 reviewer_router = APIRouter()
 
+Limit = Annotated[
+    int,
+    Query(ge=1, le=config.pagination.max_limit, description="Page size."),
+]
+After = Annotated[
+    int | None,
+    Query(description="List the items after this ID, from the Link header."),
+]
+
 
 @reviewer_router.post(
     "/repositories",
@@ -30,16 +42,17 @@ reviewer_router = APIRouter()
 async def add_repository(
     request: AddRepositoryRequest,
     _user: Annotated[User, Depends(get_current_user)],
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Register a repository."""
     repository = await pull_request_controller.add_repository(
         repository_name=request.repository_name,
         github_url=request.github_url,
+        file_filter=request.file_filter,
     )
     response_payload = {"repository_id": repository.id, "message": "Repository added."}
 
     headers = {"Location": f"/repositories/{repository.id}"}
-    return JSONResponse(
+    return ORJSONResponse(
         content=response_payload,
         headers=headers,
         status_code=HTTP_201_CREATED,
@@ -50,12 +63,29 @@ async def add_repository(
     "/repositories",
     tags=[ApplicationTags.REVIEWER_TAG],
     status_code=status.HTTP_200_OK,
+    response_model=list[Repository],
 )
 async def list_repositories(
+    request: Request,
     _user: Annotated[User, Depends(get_current_user)],
-) -> list[Repository]:
-    """List repositories."""
-    return await pull_request_controller.list_repositories()
+    limit: Limit = config.pagination.default_limit,
+    after: After = None,
+    repository_name: str | None = None,
+) -> Response:
+    """List repositories, a page at a time.
+
+    The next page, if any, is linked in the Link header.
+
+    :param limit: The maximum number of repositories listed.
+    :param after: The repository ID to list after.
+    :param repository_name: Only list repositories whose name starts with this.
+    """
+    page = await pull_request_controller.list_repositories(
+        limit=limit,
+        after=after,
+        repository_name=repository_name,
+    )
+    return json_response(page.items, headers=get_link_header(request, page))
 
 
 @reviewer_router.delete(
@@ -66,11 +96,11 @@ async def list_repositories(
 async def delete_repository(
     repository_id: int,
     _user: Annotated[User, Depends(get_current_user)],
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Delete a repository."""
     await pull_request_controller.delete_repository(repository_id=repository_id)
 
-    return JSONResponse(
+    return ORJSONResponse(
         content={"message": "Repository deleted."},
         status_code=status.HTTP_204_NO_CONTENT,
     )
@@ -92,16 +122,56 @@ async def get_repository(
     return await pull_request_controller.get_repository(repository_id=repository_id)
 
 
+@reviewer_router.put(
+    "/repositories/{repository_id}/file_filter",
+    tags=[ApplicationTags.REVIEWER_TAG],
+    status_code=status.HTTP_200_OK,
+)
+async def update_file_filter(
+    repository_id: int,
+    file_filter: FileFilterConfig,
+    _user: Annotated[User, Depends(get_current_user)],
+) -> ORJSONResponse:
+    """Set which changed files of a repository are reviewed, on top of the defaults.
+
+    :param repository_id: The repository ID.
+    :param file_filter: The file filter of the repository.
+    """
+    await pull_request_controller.update_file_filter(
+        repository_id=repository_id,
+        file_filter=file_filter,
+    )
+    return ORJSONResponse(
+        content={"message": "File filter updated."},
+        status_code=status.HTTP_200_OK,
+    )
+
+
 @reviewer_router.get(
     "/repositories/{repository_id}/pull_requests",
     tags=[ApplicationTags.REVIEWER_TAG],
+    response_model=list[PullRequest],
 )
 async def get_pull_requests(
     repository_id: int,
+    request: Request,
     _user: Annotated[User, Depends(get_current_user)],
-) -> list[PullRequest]:
-    """Get pull requests."""
-    return await pull_request_controller.get_pull_requests(repository_id=repository_id)
+    limit: Limit = config.pagination.default_limit,
+    after: After = None,
+) -> Response:
+    """Get pull requests, a page at a time.
+
+    The next page, if any, is linked in the Link header.
+
+    :param limit: The maximum number of pull requests listed.
+    :param after: The pull request ID to list after.
+    """
+    page = await pull_request_controller.get_pull_requests(
+        repository_id=repository_id,
+        limit=limit,
+        after=after,
+    )
+    return json_response(page.items, headers=get_link_header(request, page))
 
 
 @reviewer_router.get(
@@ -131,7 +201,7 @@ async def register_pull_request(
     repository_id: int,
     request: RegisterPRRequest,
     _user: Annotated[User, Depends(get_current_user)],
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Register a pull request.
 
     :param pull_request: The pull request.
@@ -149,7 +219,7 @@ async def register_pull_request(
 
     response_payload = {"pull_request_id": pull_request.id, "message": "PR registered."}
     headers = {"Location": f"/pull_requests/{pull_request.id}"}
-    return JSONResponse(
+    return ORJSONResponse(
         content=response_payload,
         headers=headers,
         status_code=status.HTTP_201_CREATED,
@@ -159,38 +229,58 @@ async def register_pull_request(
 @reviewer_router.get(
     "/repositories/{repository_id}/pull_requests/{pull_request_id}/reviews",
     tags=[ApplicationTags.REVIEWER_TAG],
+    response_model=list[Review],
 )
 async def get_reviews(
     repository_id: int,
     pull_request_id: int,
+    request: Request,
     _user: Annotated[User, Depends(get_current_user)],
-) -> list[Review]:
-    """Get reviews.
+    limit: Limit = config.pagination.default_limit,
+    after: After = None,
+    review_status: Annotated[ReviewStatus | None, Query(alias="status")] = None,
+) -> Response:
+    """Get reviews, a page at a time.
+
+    The next page, if any, is linked in the Link header.
 
     :param pull_request_id: The pull request ID.
+    :param limit: The maximum number of reviews listed.
+    :param after: The review ID to list after.
+    :param review_status: Only list reviews with this status.
     """
-    return await pull_request_controller.get_reviews(
+    page = await pull_request_controller.get_reviews(
         repository_id=repository_id,
         pull_request_id=pull_request_id,
+        limit=limit,
+        after=after,
+        review_status=review_status,
     )
+    return json_response(page.items, headers=get_link_header(request, page))
 
 
 @reviewer_router.get(
     "/repositories/{repository_id}/pull_requests/{pull_request_id}/reviews/{review_id}",
     tags=[ApplicationTags.REVIEWER_TAG],
     status_code=status.HTTP_200_OK,
+    response_model=ReviewResponse,
 )
 async def get_review(
     repository_id: int,
     pull_request_id: int,
     review_id: int,
-) -> ReviewResponse:
-    """Get a review."""
-    return await pull_request_controller.get_review(
+    request: Request,
+) -> Response:
+    """Get a review.
+
+    The review is compressed if the client accepts it, see Accept-Encoding.
+    """
+    review = await pull_request_controller.get_review(
         repository_id=repository_id,
         pull_request_id=pull_request_id,
         review_id=review_id,
     )
+    return await compressed_json_response(request, review)
 
 
 @reviewer_router.delete(
@@ -203,7 +293,7 @@ async def delete_review(
     pull_request_id: int,
     review_id: int,
     _user: Annotated[User, Depends(get_current_user)],
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Delete a review."""
     await pull_request_controller.delete_review(
         repository_id=repository_id,
@@ -211,7 +301,7 @@ async def delete_review(
         review_id=review_id,
     )
 
-    return JSONResponse(
+    return ORJSONResponse(
         content={"message": "Review deleted."},
         status_code=status.HTTP_204_NO_CONTENT,
     )
@@ -220,28 +310,117 @@ async def delete_review(
 @reviewer_router.post(
     "/repositories/{repository_id}/pull_requests/{pull_request_id}/reviews",
     tags=[ApplicationTags.REVIEWER_TAG],
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def create_review(
     repository_id: int,
     pull_request_id: int,
     _user: Annotated[User, Depends(get_current_user)],
-) -> JSONResponse:
-    """Create a review using AI."""
-    review_response: ReviewResponse = await pull_request_controller.create_review(
+    *,
+    incremental: bool = False,
+) -> ORJSONResponse:
+    """Create a review using AI.
+
+    The review runs in the background; poll the status URL for its progress.
+
+    :param incremental: Only review files changed since the last review.
+    """
+    review = await pull_request_controller.create_review(
         repository_id=repository_id,
         pull_request_id=pull_request_id,
+        incremental=incremental,
     )
 
+    status_url = (
+        f"/repositories/{repository_id}/pull_requests/{pull_request_id}"
+        f"/reviews/{review.id}/status"
+    )
     response_payload = {
-        "review_contents": review_response.review_contents,
-        "review_id": review_response.review_id,
-        "message": "Review created.",
+        "review_id": review.id,
+        "status": review.status,
+        "status_url": status_url,
+        "message": "Review queued.",
     }
 
-    headers = {"Location": f"/reviews/{review_response.review_id}"}
+    headers = {"Location": status_url}
 
-    return JSONResponse(
+    return ORJSONResponse(
         content=response_payload,
         headers=headers,
-        status_code=HTTP_201_CREATED,
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+
+@reviewer_router.post(
+    "/repositories/{repository_id}/pull_requests/{pull_request_id}/reviews/stream",
+    tags=[ApplicationTags.REVIEWER_TAG],
+    status_code=status.HTTP_200_OK,
+)
+async def stream_review(
+    repository_id: int,
+    pull_request_id: int,
+    _user: Annotated[User, Depends(get_current_user)],
+    *,
+    incremental: bool = False,
+) -> StreamingResponse:
+    """Create a review using AI and stream it as Server-Sent Events.
+
+    Every event is tagged with the file it relates to, such that the tokens of
+    concurrently reviewed files can be told apart.
+
+    :param incremental: Only review files changed since the last review.
+    """
+    review_events = await pull_request_controller.stream_review(
+        repository_id=repository_id,
+        pull_request_id=pull_request_id,
+        incremental=incremental,
+    )
+
+    async def server_sent_events() -> AsyncIterator[str]:
+        async for event in review_events:
+            yield (
+                f"event: {event.type}\n"
+                f"data: {event.model_dump_json(exclude_none=True)}\n\n"
+            )
+
+    return StreamingResponse(
+        server_sent_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@reviewer_router.get(
+    "/repositories/{repository_id}/pull_requests/{pull_request_id}/reviews/{review_id}/status",
+    tags=[ApplicationTags.REVIEWER_TAG],
+    status_code=status.HTTP_200_OK,
+    response_model=ReviewStatusResponse,
+)
+async def get_review_status(
+    repository_id: int,
+    pull_request_id: int,
+    review_id: int,
+    _user: Annotated[User, Depends(get_current_user)],
+) -> Response:
+    """Get the status and progress of a review."""
+    try:
+        review = await pull_request_controller.get_review_status(
+            repository_id=repository_id,
+            pull_request_id=pull_request_id,
+            review_id=review_id,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        ) from e
+
+    return json_response(
+        ReviewStatusResponse(
+            review_id=review.id,
+            status=review.status,
+            files_done=review.files_done,
+            files_total=review.files_total,
+            failure_reason=review.failure_reason,
+        ),
     )
@@ -0,0 +1,133 @@
+"""Skip changed files that are not worth a review."""
+
+from __future__ import annotations
+
+import re
+from fnmatch import fnmatchcase
+from typing import TYPE_CHECKING, Self
+
+if TYPE_CHECKING:
+    from box import Box
+
+    from api.reviewer.models.pull_request import PullRequestFileChanges
+    from api.reviewer.models.repository import FileFilterConfig
+
+# Number of leading patch lines searched for markers of generated code.
+GENERATED_MARKER_LINES = 10
+
+
+class FileFilter:
+    """Rule-based filter deciding which changed files are sent to the LLM.
+
+    Glob patterns match the whole path, where `*` also matches `/`. Patterns
+    without a `/` match the file name alone as well.
+    """
+
+    def __init__(
+        self: Self,
+        exclude: list[str],
+        exclude_regex: list[str],
+        include: list[str],
+        generated_markers: list[str],
+        max_changes: int,
+    ) -> None:
+        """Initialize the filter.
+
+        :param exclude: Glob patterns of paths to skip.
+        :param exclude_regex: Regular expressions searched in paths to skip.
+        :param include: Glob patterns of paths to review even if excluded.
+        :param generated_markers: Text marking a file as generated near the top
+            of its patch.
+        :param max_changes: Changed lines above which a file is skipped.
+        """
+        self.exclude = exclude
+        self.exclude_regex = [re.compile(pattern) for pattern in exclude_regex]
+        self.include = include
+        self.generated_markers = generated_markers
+        self.max_changes = max_changes
+
+    @classmethod
+    def from_config(
+        cls: type[FileFilter],
+        default_config: Box,
+        repository_config: FileFilterConfig | None = None,
+    ) -> FileFilter:
+        """Create the filter of a repository.
+
+        The patterns of the repository extend the default ones.
+
+        :param default_config: The default file filter configuration.
+        :param repository_config: The file filter configuration of the repository.
+        :return: The file filter.
+        """
+        exclude = list(default_config.exclude)
+        exclude_regex = list(default_config.exclude_regex)
+        include = list(default_config.include)
+        max_changes = default_config.max_changes
+        if repository_config is not None:
+            exclude += repository_config.exclude
+            exclude_regex += repository_config.exclude_regex
+            include += repository_config.include
+            max_changes = repository_config.max_changes or max_changes
+
+        return cls(
+            exclude=exclude,
+            exclude_regex=exclude_regex,
+            include=include,
+            generated_markers=list(default_config.generated_markers),
+            max_changes=max_changes,
+        )
+
+    def get_skip_reason(self: Self, file_changes: PullRequestFileChanges) -> str | None:
+        """Get why a file is not worth a review.
+
+        :param file_changes: The changes of the file.
+        :return: Why the file is skipped, or None if it is reviewed.
+        """
+        filename = file_changes.filename
+        if not file_changes.patch:
+            return "No textual diff, e.g. a binary file or a diff too large to show."
+        if file_changes.changes > self.max_changes:
+            return (
+                f"{file_changes.changes} changed lines exceed the limit of "
+                f"{self.max_changes}."
+            )
+        if any(_matches(filename, pattern) for pattern in self.include):
+            return None
+        return self._get_exclude_reason(filename) or self._get_generated_reason(
+            file_changes.patch,
+        )
+
+    def _get_exclude_reason(self: Self, filename: str) -> str | None:
+        """Get why a path is excluded.
+
+        :param filename: The path of the file.
+        :return: The excluded pattern the path matches, or None if there is none.
+        """
+        for pattern in self.exclude:
+            if _matches(filename, pattern):
+                return f"Path matches the excluded pattern {pattern}."
+        for regex in self.exclude_regex:
+            if regex.search(filename):
+                return f"Path matches the excluded expression {regex.pattern}."
+        return None
+
+    def _get_generated_reason(self: Self, patch: str) -> str | None:
+        """Get why a file is considered generated.
+
+        :param patch: The patch of the file.
+        :return: The generated marker at the top of the patch, or None if there is
+            none.
+        """
+        patch_head = "\n".join(patch.splitlines()[:GENERATED_MARKER_LINES])
+        for marker in self.generated_markers:
+            if marker in patch_head:
+                return f"Generated file, marked with {marker}."
+        return None
+
+
+def _matches(filename: str, pattern: str) -> bool:
+    """Check whether a path matches a glob pattern."""
+    if fnmatchcase(filename, pattern):
+        return True
+    return "/" not in pattern and fnmatchcase(filename.rsplit("/", 1)[-1], pattern)
@@ -0,0 +1,35 @@
+"""Pack the changes of small files into batches reviewed in one request."""
+
+from api.reviewer.models.pull_request import PullRequestFileChanges
+from api.utils.tokens import estimate_tokens
+
+
+def pack_files(
+    files: list[PullRequestFileChanges],
+    max_batch_tokens: int,
+    max_batch_files: int,
+) -> list[list[PullRequestFileChanges]]:
+    """Pack files into batches, keeping their order.
+
+    :param files: The file changes to pack.
+    :param max_batch_tokens: The maximum estimated number of patch tokens of a batch.
+    :param max_batch_files: The maximum number of files of a batch.
+    :return: The batches.
+    """
+    batches: list[list[PullRequestFileChanges]] = []
+    batch: list[PullRequestFileChanges] = []
+    batch_tokens = 0
+    for file in files:
+        file_tokens = estimate_tokens(file.patch)
+        if batch and (
+            batch_tokens + file_tokens > max_batch_tokens
+            or len(batch) >= max_batch_files
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(file)
+        batch_tokens += file_tokens
+
+    if batch:
+        batches.append(batch)
+    return batches
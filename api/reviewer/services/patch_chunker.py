@@ -0,0 +1,74 @@
+"""Split patches into pieces that fit the context of the LLM."""
+
+from api.utils.tokens import estimate_tokens
+
+HUNK_HEADER_PREFIX = "@@"
+
+
+def split_hunks(patch: str) -> list[str]:
+    """Split a patch into its hunks.
+
+    :param patch: The patch of a file, as returned by Github.
+    :return: The hunks, each starting with its header.
+    """
+    hunks: list[list[str]] = []
+    for line in patch.splitlines(keepends=True):
+        if line.startswith(HUNK_HEADER_PREFIX) or not hunks:
+            hunks.append([])
+        hunks[-1].append(line)
+    return ["".join(hunk) for hunk in hunks]
+
+
+def split_patch(patch: str, max_tokens: int) -> list[str]:
+    """Split a patch on hunk boundaries into chunks of at most `max_tokens`.
+
+    Consecutive hunks are packed into the same chunk as long as they fit. A hunk
+    that does not fit on its own is split on line boundaries, repeating the hunk
+    header at the start of every piece.
+
+    :param patch: The patch of a file, as returned by Github.
+    :param max_tokens: The maximum estimated number of tokens of a chunk.
+    :return: The chunks, in order.
+    """
+    chunks: list[str] = []
+    chunk = ""
+    chunk_tokens = 0
+    for hunk in split_hunks(patch):
+        for piece in _split_hunk(hunk, max_tokens):
+            piece_tokens = estimate_tokens(piece)
+            if chunk and chunk_tokens + piece_tokens > max_tokens:
+                chunks.append(chunk)
+                chunk, chunk_tokens = "", 0
+            chunk += piece
+            chunk_tokens += piece_tokens
+
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _split_hunk(hunk: str, max_tokens: int) -> list[str]:
+    """Split a hunk on line boundaries into pieces of at most `max_tokens`.
+
+    :param hunk: The hunk, starting with its header.
+    :param max_tokens: The maximum estimated number of tokens of a piece.
+    :return: The pieces, each starting with the hunk header.
+    """
+    if estimate_tokens(hunk) <= max_tokens:
+        return [hunk]
+
+    header, *lines = hunk.splitlines(keepends=True)
+    header_tokens = estimate_tokens(header)
+    pieces: list[str] = []
+    piece = [header]
+    piece_tokens = header_tokens
+    for line in lines:
+        line_tokens = estimate_tokens(line)
+        if len(piece) > 1 and piece_tokens + line_tokens > max_tokens:
+            pieces.append("".join(piece))
+            piece, piece_tokens = [header], header_tokens
+        piece.append(line)
+        piece_tokens += line_tokens
+
+    pieces.append("".join(piece))
+    return pieces
@@ -1,28 +1,554 @@
 """Pull request services."""
 
 import asyncio
+import logging
+import math
+from datetime import UTC, datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine
 
 import httpx
-from fastapi import HTTPException, status
 
+from api.common.models.page import Page
 from api.common.tools.review_pull_request import ReviewPullRequest
+from api.common.tools.review_pull_request_batch import ReviewPullRequestBatch
 from api.config import config
 from api.reviewer.dto.responses import ReviewResponse
-from api.reviewer.models.pull_request import PullRequest, PullRequestFileChanges
-from api.reviewer.models.repository import Repository
-from api.reviewer.models.review import Review
+from api.reviewer.models.pull_request import (
+    PullRequest,
+    PullRequestFileChanges,
+    PullRequestFilesPage,
+    PullRequestSnapshot,
+)
+from api.reviewer.models.repository import FileFilterConfig, Repository
+from api.reviewer.models.review import (
+    FileReview,
+    FileReviewStatus,
+    Review,
+    ReviewEvent,
+    ReviewEventType,
+    ReviewStatus,
+)
 from api.reviewer.repositories import pull_request_repository
+from api.reviewer.services.file_filter import FileFilter
+from api.reviewer.services.file_packer import pack_files
+from api.reviewer.services.patch_chunker import split_patch
+from api.reviewer.services.review_cache import get_review_cache_key, review_cache
+from api.utils.background import BackgroundExecutor
+from api.utils.batch_writer import BatchWriter
+from api.utils.github import (
+    GithubRateLimitError,
+    GithubUnavailableError,
+    get_api_base_url,
+    github_client,
+)
+from api.utils.llm import LLM_ERRORS
+from api.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+EventCallback = Callable[[ReviewEvent], Awaitable[None]]
+# Errors failing the review of a file rather than the whole review: failed LLM
+# requests, and answers or prompts that cannot be used.
+FILE_REVIEW_ERRORS = (*LLM_ERRORS, ValueError)
+# Each task reviews one file, or a batch of small files, and persists the
+# reviews.
+ReviewTasks = list[tuple[list[PullRequestFileChanges], asyncio.Task]]
+
+# Maximum page size of Github's pull request files endpoint.
+GITHUB_FILES_PER_PAGE = 100
+# Maximum number of files listed by Github's compare endpoint.
+GITHUB_COMPARE_MAX_FILES = 300
+
+review_jobs = BackgroundExecutor(
+    name="review_jobs",
+    max_concurrency=config.max_concurrent_review_jobs,
+)
+# Writes off the critical path of a review. Created after the review jobs, such
+# that shutdown drains it after them.
+background_writes = BackgroundExecutor(
+    name="background_writes",
+    max_concurrency=config.max_concurrent_background_writes,
+)
+# File reviews are persisted as soon as they complete, such that they survive
+# a failed review job and are visible while the job runs.
+file_review_writer: BatchWriter[tuple[int, FileReview]] = BatchWriter(
+    name="file_review_writer",
+    flush=pull_request_repository.add_file_reviews,
+    **config.file_review_writer,
+)
 
 
 async def create_review(
     repository_id: int,
     pull_request_id: int,
-) -> ReviewResponse:
-    """Create a review.
+    *,
+    incremental: bool = False,
+) -> Review:
+    """Create a review job.
+
+    The review is persisted as queued and its files are reviewed in the background.
+
+    :param repository_id: The repository id.
+    :param pull_request_id: The pull request id.
+    :param incremental: Whether to only review files changed since the last review.
+    :return: The queued review.
+    """
+    review = await pull_request_repository.add_review(
+        pull_request_id=pull_request_id,
+    )
+    review_jobs.submit(
+        _run_review_job(
+            repository_id=repository_id,
+            pull_request_id=pull_request_id,
+            review_id=review.id,
+            incremental=incremental,
+        ),
+        name=f"review-{review.id}",
+    )
+    return review
+
+
+async def stream_review(
+    repository_id: int,
+    pull_request_id: int,
+    *,
+    incremental: bool = False,
+) -> AsyncIterator[ReviewEvent]:
+    """Create a review and stream its events as the LLM produces them.
+
+    The review is created before returning, such that failing to create it
+    raises here rather than while streaming. Token events of all concurrently
+    reviewed files are multiplexed in order of arrival. The review keeps running
+    in the background if the client goes away.
 
     :param repository_id: The repository id.
-    :param pull_request_number: The pull request id.
-    :return: The review ID.
+    :param pull_request_id: The pull request id.
+    :param incremental: Whether to only review files changed since the last review.
+    :return: Iterator over the review events.
+    """
+    review = await pull_request_repository.add_review(
+        pull_request_id=pull_request_id,
+    )
+    events: asyncio.Queue[ReviewEvent | None] = asyncio.Queue()
+    listening = True
+
+    async def publish(event: ReviewEvent) -> None:
+        if listening:
+            events.put_nowait(event)
+
+    job = review_jobs.submit(
+        _run_review_job(
+            repository_id=repository_id,
+            pull_request_id=pull_request_id,
+            review_id=review.id,
+            incremental=incremental,
+            on_event=publish,
+        ),
+        name=f"review-{review.id}",
+    )
+    job.add_done_callback(lambda _: events.put_nowait(None))
+
+    async def iter_events() -> AsyncIterator[ReviewEvent]:
+        nonlocal listening
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            listening = False
+
+    return iter_events()
+
+
+async def _run_review_job(
+    repository_id: int,
+    pull_request_id: int,
+    review_id: int,
+    *,
+    incremental: bool = False,
+    on_event: EventCallback | None = None,
+) -> None:
+    """Review all files of a pull request and persist the results.
+
+    Each file review is persisted as soon as it completes. In incremental mode,
+    only files changed since the head of the previous review are sent to the
+    LLM. The reviews of the other files are carried over by reference.
+
+    :param repository_id: The repository id.
+    :param pull_request_id: The pull request id.
+    :param review_id: The review id.
+    :param incremental: Whether to only review files changed since the last review.
+    :param on_event: Callback receiving the events of the review.
+    """
+    on_event = on_event or _ignore_event
+    file_order: dict[str, int] = {}
+    review_tasks: ReviewTasks = []
+    try:
+        await pull_request_repository.update_review(
+            review_id=review_id,
+            status=ReviewStatus.running,
+        )
+        await on_event(
+            ReviewEvent(type=ReviewEventType.review_started, review_id=review_id),
+        )
+
+        previous_review = (
+            await pull_request_repository.get_previous_review(
+                pull_request_id=pull_request_id,
+                review_id=review_id,
+            )
+            if incremental
+            else None
+        )
+        carry_over_from: dict[str, int] = {}
+        repository = await pull_request_repository.get_repository(
+            repository_id=repository_id,
+        )
+        file_filter = FileFilter.from_config(
+            default_config=config.file_filter,
+            repository_config=repository.file_filter,
+        )
+
+        # Files are reviewed as soon as their page arrives, such that the
+        # reviews of the first page overlap with fetching the remaining pages.
+        async for page in _iter_pull_request_file_changes(
+            repository_id=repository_id,
+            pull_request_id=pull_request_id,
+        ):
+            if not file_order:
+                await pull_request_repository.update_review(
+                    review_id=review_id,
+                    base_sha=page.base_sha,
+                    head_sha=page.head_sha,
+                )
+                if previous_review is not None:
+                    carry_over_from = await _get_carry_over_from(
+                        repository_id=repository_id,
+                        previous_review=previous_review,
+                        head_sha=page.head_sha,
+                    )
+
+            for file_changes in page.file_changes:
+                file_order[file_changes.filename] = len(file_order)
+            review_tasks.extend(
+                (
+                    files,
+                    asyncio.create_task(
+                        _save_file_reviews(
+                            files=files,
+                            review_task=review_coroutine,
+                            review_id=review_id,
+                            file_order=file_order,
+                            on_event=on_event,
+                        ),
+                    ),
+                )
+                for files, review_coroutine in _get_file_review_coroutines(
+                    files=page.file_changes,
+                    file_filter=file_filter,
+                    carry_over_from=carry_over_from,
+                    review_id=review_id,
+                    on_event=on_event,
+                )
+            )
+            await pull_request_repository.update_review(
+                review_id=review_id,
+                files_total=len(file_order),
+            )
+
+        review_results = await asyncio.gather(
+            *(review_task for _, review_task in review_tasks),
+            return_exceptions=True,
+        )
+    except (Exception, asyncio.CancelledError) as e:
+        for _, review_task in review_tasks:
+            review_task.cancel()
+        await _finish_review(
+            review_id=review_id,
+            review_status=ReviewStatus.failed,
+            failure_reason=_get_failure_reason(e),
+            on_event=on_event,
+        )
+        raise
+
+    review_status, failure_reason = _get_review_outcome(
+        review_tasks=review_tasks,
+        review_results=review_results,
+        review_id=review_id,
+    )
+    await _finish_review(
+        review_id=review_id,
+        review_status=review_status,
+        failure_reason=failure_reason,
+        on_event=on_event,
+    )
+
+
+def _get_file_review_coroutines(
+    files: list[PullRequestFileChanges],
+    file_filter: FileFilter,
+    carry_over_from: dict[str, int],
+    review_id: int,
+    on_event: EventCallback,
+) -> list[tuple[list[PullRequestFileChanges], Coroutine[Any, Any, Any]]]:
+    """Get the coroutines reviewing files.
+
+    Skipped files and files whose review is carried over are not sent to the
+    LLM. Small files are packed into batches sharing a request, the other files
+    are reviewed one by one.
+
+    :param files: The pull request file changes to review.
+    :param file_filter: The filter of files not worth reviewing.
+    :param carry_over_from: Per unchanged file name, the file review to carry over.
+    :param review_id: The review id.
+    :param on_event: Callback receiving the events of the review.
+    :return: The coroutines, each with the files it reviews.
+    """
+    review_coroutines: list[
+        tuple[list[PullRequestFileChanges], Coroutine[Any, Any, Any]]
+    ] = []
+    small_files: list[PullRequestFileChanges] = []
+    for file_changes in files:
+        if skip_reason := file_filter.get_skip_reason(file_changes):
+            review_coroutine = _skip_file_review(
+                file_changes=file_changes,
+                reason=skip_reason,
+                review_id=review_id,
+                on_event=on_event,
+            )
+        elif file_changes.filename in carry_over_from:
+            review_coroutine = _carry_over_file_review(
+                file_changes=file_changes,
+                carried_over_from_id=carry_over_from[file_changes.filename],
+                review_id=review_id,
+                on_event=on_event,
+            )
+        elif _is_packable(file_changes):
+            small_files.append(file_changes)
+            continue
+        else:
+            review_coroutine = _create_review_task(
+                file_changes=file_changes,
+                review_id=review_id,
+                on_event=on_event,
+            )
+        review_coroutines.append(([file_changes], review_coroutine))
+
+    # Small files share LLM requests, saving the per-request overhead.
+    review_coroutines.extend(
+        (
+            batch,
+            _create_batch_review_task(
+                files=batch,
+                review_id=review_id,
+                on_event=on_event,
+            ),
+        )
+        for batch in pack_files(
+            small_files,
+            max_batch_tokens=config.file_packing.max_batch_tokens,
+            max_batch_files=config.file_packing.max_batch_files,
+        )
+    )
+    return review_coroutines
+
+
+def _get_review_outcome(
+    review_tasks: ReviewTasks,
+    review_results: list[list[FileReview] | BaseException],
+    review_id: int,
+) -> tuple[ReviewStatus, str | None]:
+    """Get the status of a review from the results of its tasks.
+
+    :param review_tasks: The tasks of the review, each with the files it reviewed.
+    :param review_results: The file reviews persisted by each task, or its error.
+    :param review_id: The review id.
+    :return: The status of the review, and why it failed if any file failed.
+    """
+    files_total = files_failed = 0
+    for (files, _), review_result in zip(review_tasks, review_results, strict=True):
+        files_total += len(files)
+        if isinstance(review_result, BaseException):
+            # The file reviews could not be persisted.
+            logger.error(
+                f"Failed to save the review of {len(files)} files of review "
+                f"{review_id}.",
+                exc_info=review_result,
+            )
+            files_failed += len(files)
+        else:
+            files_failed += sum(
+                file_review.status == FileReviewStatus.failed
+                for file_review in review_result
+            )
+
+    if not files_failed:
+        return ReviewStatus.done, None
+    failure_reason = f"The review of {files_failed} of {files_total} files failed."
+    if files_failed < files_total:
+        return ReviewStatus.partial, failure_reason
+    return ReviewStatus.failed, failure_reason
+
+
+async def _finish_review(
+    review_id: int,
+    review_status: ReviewStatus,
+    failure_reason: str | None,
+    on_event: EventCallback,
+) -> None:
+    """Persist the final status of a review and report it.
+
+    :param review_id: The review id.
+    :param review_status: The final status of the review.
+    :param failure_reason: Why the review, or some of its files, failed.
+    :param on_event: Callback receiving the events of the review.
+    """
+    await pull_request_repository.update_review(
+        review_id=review_id,
+        status=review_status,
+        failure_reason=failure_reason,
+    )
+    await on_event(
+        ReviewEvent(
+            type=ReviewEventType.review_done,
+            review_id=review_id,
+            status=review_status,
+            content=failure_reason,
+        ),
+    )
+
+
+async def _save_file_reviews(
+    files: list[PullRequestFileChanges],
+    review_task: Coroutine[Any, Any, FileReview | list[FileReview]],
+    review_id: int,
+    file_order: dict[str, int],
+    on_event: EventCallback,
+) -> list[FileReview]:
+    """Run the review task of files and persist their reviews once it completes.
+
+    If the task fails, whatever the error, its files are persisted as failed,
+    such that every file of the review is recorded with its outcome.
+
+    :param files: The pull request file changes reviewed by the task.
+    :param review_task: The task reviewing one file, or a batch of files.
+    :param review_id: The review id.
+    :param file_order: The position of each file in the pull request.
+    :param on_event: Callback receiving the events of the review.
+    :return: The persisted file reviews.
+    """
+    started_at = datetime.now(UTC)
+    try:
+        review_result = await review_task
+    except Exception as e:  # noqa: BLE001 - logged by _fail_file_review
+        file_reviews = [
+            await _fail_file_review(
+                file_changes=file_changes,
+                error=e,
+                review_id=review_id,
+                on_event=on_event,
+            )
+            for file_changes in files
+        ]
+    else:
+        file_reviews = (
+            [review_result] if isinstance(review_result, FileReview) else review_result
+        )
+
+    finished_at = datetime.now(UTC)
+    file_reviews = [
+        file_review.model_copy(
+            update={
+                "position": file_order[file_review.file_name],
+                "started_at": started_at,
+                "finished_at": finished_at,
+            },
+        )
+        for file_review in file_reviews
+    ]
+    await file_review_writer.write(
+        [(review_id, file_review) for file_review in file_reviews],
+    )
+    return file_reviews
+
+
+async def _get_carry_over_from(
+    repository_id: int,
+    previous_review: tuple[Review, dict[str, int]],
+    head_sha: str | None,
+) -> dict[str, int]:
+    """Get the file reviews of the previous review that are still up to date.
+
+    Files are compared between the head of the previous review and the current
+    head. If they cannot be compared, e.g. after a force push, nothing is
+    carried over.
+
+    :param repository_id: The repository id.
+    :param previous_review: The previous review and its file review IDs per file.
+    :param head_sha: The SHA of the head commit under review.
+    :return: Per unchanged file name, the ID of the file review to carry over.
+    """
+    review, file_review_ids = previous_review
+    if head_sha is None or review.head_sha is None:
+        return {}
+    if head_sha == review.head_sha:
+        return file_review_ids
+
+    repository = await pull_request_repository.get_repository(
+        repository_id=repository_id,
+    )
+    url = (
+        f"{get_api_base_url(repository.github_url)}/repos/"
+        f"{repository.repository_name}/compare/{review.head_sha}...{head_sha}"
+    )
+    try:
+        response = await github_client.get(url)
+    except httpx.HTTPError:
+        logger.warning(
+            f"Failed to compare {review.head_sha}...{head_sha}, reviewing all files.",
+            exc_info=True,
+        )
+        return {}
+
+    comparison = response.json()
+    changed_files = comparison.get("files", [])
+    if comparison.get("status") not in ("ahead", "identical") or (
+        len(changed_files) >= GITHUB_COMPARE_MAX_FILES
+    ):
+        # The head was rewritten, or Github truncated the list of changed files.
+        return {}
+
+    changed_file_names = {
+        file_name
+        for file in changed_files
+        for file_name in (file["filename"], file.get("previous_filename"))
+        if file_name is not None
+    }
+    return {
+        file_name: file_review_id
+        for file_name, file_review_id in file_review_ids.items()
+        if file_name not in changed_file_names
+    }
+
+
+async def _ignore_event(_event: ReviewEvent) -> None:
+    """Drop an event nobody listens to."""
+
+
+async def _iter_pull_request_file_changes(
+    repository_id: int,
+    pull_request_id: int,
+) -> AsyncIterator[PullRequestFilesPage]:
+    """Fetch the changed files of a pull request from Github, page by page.
+
+    The pull request is first requested conditionally on the stored snapshot.
+    If Github answers 304 Not Modified, which does not count against the rate
+    limit, or does not answer in time, the snapshot is reused. Otherwise the
+    files are fetched and stored as the new snapshot.
+    Github lists at most 3000 files of a pull request.
+
+    :param repository_id: The repository id.
+    :param pull_request_id: The pull request id.
+    :return: Iterator over the pages of file changes.
     """
     repository = await pull_request_repository.get_repository(
         repository_id=repository_id,
@@ -31,87 +557,621 @@ async def create_review(
         repository_id=repository_id,
         pull_request_id=pull_request_id,
     )
+    snapshot = await pull_request_repository.get_pull_request_snapshot(
+        pull_request_id=pull_request_id,
+    )
 
-    # TODO: wrap this request in a function
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {config.github_token}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-    # TODO: support other github urls
-    url = f"https://{repository.github_url}/repos/{repository.repository_name}/pulls/{pull_request.pull_request_number}/files"
-    timeout = httpx.Timeout(config.request_timeout, read=None)
-    async with httpx.AsyncClient() as client:
+    url = (
+        f"{get_api_base_url(repository.github_url)}/repos/"
+        f"{repository.repository_name}/pulls/{pull_request.pull_request_number}"
+    )
+    try:
+        pull_request_response = await github_client.get(
+            url,
+            headers=_get_conditional_headers(snapshot),
+            timeout=config.github.snapshot_timeout if snapshot else None,
+        )
+    except httpx.HTTPError as e:
+        if snapshot is None:
+            raise
+        logger.warning(
+            f"Failed to fetch pull request {pull_request_id} from Github, "
+            "reusing its snapshot.",
+            exc_info=e,
+        )
+        yield _get_snapshot_page(snapshot)
+        return
+
+    if snapshot is not None and (
+        pull_request_response.status_code == httpx.codes.NOT_MODIFIED
+    ):
+        yield _get_snapshot_page(snapshot)
+        return
+
+    pull_request_payload = pull_request_response.json()
+    base_sha = pull_request_payload["base"]["sha"]
+    head_sha = pull_request_payload["head"]["sha"]
+    file_changes: list[PullRequestFileChanges] = []
+    pages = github_client.iter_pages(
+        f"{url}/files",
+        params={"per_page": GITHUB_FILES_PER_PAGE},
+    )
+    async for callback in pages:
+        # Github omits the patch of binary files and of diffs too large to
+        # show; they are kept such that they are reported as skipped.
+        page = [
+            PullRequestFileChanges(**{"patch": "", **file})
+            for file in callback.json()
+            if set(PullRequestFileChanges.model_fields.keys()).issubset(
+                {"patch", *file.keys()},
+            )
+        ]
+        file_changes.extend(page)
+        yield PullRequestFilesPage(
+            base_sha=base_sha,
+            head_sha=head_sha,
+            file_changes=page,
+        )
+
+    background_writes.submit(
+        pull_request_repository.save_pull_request_snapshot(
+            PullRequestSnapshot(
+                pull_request_id=pull_request_id,
+                etag=pull_request_response.headers.get("ETag"),
+                last_modified=pull_request_response.headers.get("Last-Modified"),
+                base_sha=base_sha,
+                head_sha=head_sha,
+                file_changes=file_changes,
+            ),
+        ),
+        name=f"snapshot-{pull_request_id}",
+    )
+
+
+def _get_failure_reason(error: BaseException) -> str:
+    """Get why a review job failed, to show to its users.
+
+    :param error: The error the review job failed with.
+    :return: The failure reason.
+    """
+    if isinstance(error, asyncio.CancelledError):
+        return "The review was cancelled."
+    if isinstance(error, GithubUnavailableError):
+        return "Failed to fetch the pull request, Github is unavailable."
+    if isinstance(error, GithubRateLimitError):
+        return (
+            "Failed to fetch the pull request, Github rate limit exceeded. "
+            f"Retry in {math.ceil(error.retry_after)} seconds."
+        )
+    if isinstance(error, httpx.HTTPStatusError):
+        return (
+            "Failed to fetch the pull request, Github answered "
+            f"{error.response.status_code} to {error.request.url}."
+        )
+    if isinstance(error, httpx.HTTPError):
+        return "Failed to fetch the pull request from Github."
+    return "The review failed unexpectedly."
+
+
+def _get_snapshot_page(snapshot: PullRequestSnapshot) -> PullRequestFilesPage:
+    """Get all file changes of a stored snapshot as a single page."""
+    return PullRequestFilesPage(
+        base_sha=snapshot.base_sha,
+        head_sha=snapshot.head_sha,
+        file_changes=snapshot.file_changes,
+    )
+
+
+def _get_conditional_headers(snapshot: PullRequestSnapshot | None) -> dict[str, str]:
+    """Get the headers to request a pull request only if it changed.
+
+    :param snapshot: The stored snapshot of the pull request, if any.
+    :return: The conditional request headers.
+    """
+    headers = {}
+    if snapshot is not None and snapshot.etag:
+        headers["If-None-Match"] = snapshot.etag
+    if snapshot is not None and snapshot.last_modified:
+        headers["If-Modified-Since"] = snapshot.last_modified
+    return headers
+
+
+async def _create_review_task(
+    file_changes: PullRequestFileChanges,
+    review_id: int,
+    on_event: EventCallback,
+) -> FileReview:
+    """Create a review task for a single file.
+
+    :param file_changes: The pull request file changes.
+    :param review_id: The review id, used to report progress.
+    :param on_event: Callback receiving the tokens as they are produced.
+    :return: The file review.
+    """
+    patch_tokens = estimate_tokens(file_changes.patch)
+    if patch_tokens > config.max_file_tokens:
+        return await _reject_file_review(
+            file_changes=file_changes,
+            reason=(
+                f"Patch of ~{patch_tokens} tokens exceeds the limit of "
+                f"{config.max_file_tokens} tokens."
+            ),
+            review_id=review_id,
+            on_event=on_event,
+        )
+
+    # Unchanged files are answered from the cache without asking the LLM.
+    prompts = ReviewPullRequest.get_prompts(request=file_changes)
+    cache_key = _get_cache_key(file_changes=file_changes, prompts=prompts)
+    cached_answer = await _get_cached_answer(cache_key)
+    if cached_answer is not None:
+        await _publish_answer(
+            file_changes=file_changes,
+            answer=cached_answer,
+            review_id=review_id,
+            on_event=on_event,
+        )
+        return await _finish_file_review(
+            file_changes=file_changes,
+            answer=cached_answer,
+            review_id=review_id,
+            on_event=on_event,
+        )
+
+    return await _review_file(
+        file_changes=file_changes,
+        prompts=prompts,
+        cache_key=cache_key,
+        review_id=review_id,
+        on_event=on_event,
+    )
+
+
+async def _create_batch_review_task(
+    files: list[PullRequestFileChanges],
+    review_id: int,
+    on_event: EventCallback,
+) -> list[FileReview]:
+    """Create a review task for a batch of small files, reviewed in one request.
+
+    Files answered from the cache are left out of the request. The answer is
+    split into the reviews of the files, which are published once it is
+    complete. If the request fails or its answer cannot be split, the files are
+    reviewed one by one. Reviews split from a batch answer are not cached, since
+    the cache is keyed by the prompt of a single file.
+
+    :param files: The pull request file changes of the batch.
+    :param review_id: The review id, used to report progress.
+    :param on_event: Callback receiving the reviews as they are produced.
+    :return: The file reviews, in the order of the files.
+    """
+    file_reviews: dict[str, FileReview] = {}
+    uncached_files: list[tuple[PullRequestFileChanges, tuple[str, str], str]] = []
+    for file_changes in files:
+        prompts = ReviewPullRequest.get_prompts(request=file_changes)
+        cache_key = _get_cache_key(file_changes=file_changes, prompts=prompts)
+        cached_answer = await _get_cached_answer(cache_key)
+        if cached_answer is None:
+            uncached_files.append((file_changes, prompts, cache_key))
+            continue
+
+        await _publish_answer(
+            file_changes=file_changes,
+            answer=cached_answer,
+            review_id=review_id,
+            on_event=on_event,
+        )
+        file_reviews[file_changes.filename] = await _finish_file_review(
+            file_changes=file_changes,
+            answer=cached_answer,
+            review_id=review_id,
+            on_event=on_event,
+        )
+
+    answers = None
+    if len(uncached_files) > 1:
+        filenames = [file_changes.filename for file_changes, _, _ in uncached_files]
         try:
-            callback = await client.get(
-                url,
-                headers=headers,
-                timeout=timeout,
+            answer_iterator = await ReviewPullRequestBatch.arun(
+                requests=[file_changes for file_changes, _, _ in uncached_files],
             )
-            callback.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to fetch pull request files from Github.",
-            ) from e
-        pull_request_files_response = callback.json()
-
-    pull_request_file_changes_requests = [
-        PullRequestFileChanges(**file)
-        for file in pull_request_files_response
-        if set(PullRequestFileChanges.model_fields.keys()).issubset(file.keys())
-    ]
+            answer = "".join([content async for content in answer_iterator])
+        except FILE_REVIEW_ERRORS:
+            logger.warning(
+                f"Failed to review {len(filenames)} files of review {review_id} "
+                "in one request, reviewing them one by one.",
+                exc_info=True,
+            )
+        else:
+            answers = ReviewPullRequestBatch.parse_answer(answer, filenames=filenames)
+            if answers is None:
+                logger.warning(
+                    f"Failed to split the review of {len(filenames)} files of "
+                    f"review {review_id}, reviewing them one by one.",
+                )
 
-    semaphore = asyncio.Semaphore(config.max_concurrent_file_reviews)
-    review_tasks = [
-        _create_review_task(file_changes=file_changes, semaphore=semaphore)
-        for file_changes in pull_request_file_changes_requests
-    ]
-    review_contents = await asyncio.gather(*review_tasks)
+    if answers is None:
+        uncached_reviews = await asyncio.gather(
+            *(
+                _review_file(
+                    file_changes=file_changes,
+                    prompts=prompts,
+                    cache_key=cache_key,
+                    review_id=review_id,
+                    on_event=on_event,
+                )
+                for file_changes, prompts, cache_key in uncached_files
+            ),
+            return_exceptions=True,
+        )
+        for (file_changes, _, _), result in zip(
+            uncached_files,
+            uncached_reviews,
+            strict=True,
+        ):
+            file_reviews[file_changes.filename] = (
+                await _fail_file_review(
+                    file_changes=file_changes,
+                    error=result,
+                    review_id=review_id,
+                    on_event=on_event,
+                )
+                if isinstance(result, BaseException)
+                else result
+            )
+    else:
+        for file_changes, _, _ in uncached_files:
+            answer = answers[file_changes.filename]
+            await _publish_answer(
+                file_changes=file_changes,
+                answer=answer,
+                review_id=review_id,
+                on_event=on_event,
+            )
+            file_reviews[file_changes.filename] = await _finish_file_review(
+                file_changes=file_changes,
+                answer=answer,
+                review_id=review_id,
+                on_event=on_event,
+            )
 
-    review = await pull_request_repository.add_review(
-        pull_request_id=pull_request_id,
+    return [file_reviews[file_changes.filename] for file_changes in files]
+
+
+def _is_packable(file_changes: PullRequestFileChanges) -> bool:
+    """Check whether a file is small enough to be reviewed along with others."""
+    return (
+        config.file_packing.enabled
+        and estimate_tokens(file_changes.patch) <= config.file_packing.max_file_tokens
     )
 
-    asyncio.create_task(
-        pull_request_repository.add_file_review(
-            review_id=review.id,
-            review_contents=review_contents,
-            file_names=[file.filename for file in pull_request_file_changes_requests],
+
+def _get_cache_key(
+    file_changes: PullRequestFileChanges,
+    prompts: tuple[str, str],
+) -> str:
+    """Get the cache key of the review of a file."""
+    return get_review_cache_key(
+        filename=file_changes.filename,
+        patch=file_changes.patch,
+        system_prompt=prompts[0],
+        user_prompt=prompts[1],
+    )
+
+
+async def _get_cached_answer(cache_key: str) -> str | None:
+    """Get the cached review of a file, if caching is enabled."""
+    return await review_cache.get(cache_key) if config.review_cache.enabled else None
+
+
+async def _review_file(
+    file_changes: PullRequestFileChanges,
+    prompts: tuple[str, str],
+    cache_key: str,
+    review_id: int,
+    on_event: EventCallback,
+) -> FileReview:
+    """Ask the LLM to review a single file and cache the review.
+
+    :param file_changes: The pull request file changes.
+    :param prompts: The system prompt and the user prompt.
+    :param cache_key: The key to cache the review under.
+    :param review_id: The review id, used to report progress.
+    :param on_event: Callback receiving the tokens as they are produced.
+    :return: The file review.
+    """
+    answer = await _review_patch(
+        file_changes=file_changes,
+        prompts=prompts,
+        review_id=review_id,
+        on_event=on_event,
+    )
+    return await _finish_file_review(
+        file_changes=file_changes,
+        answer=answer,
+        review_id=review_id,
+        on_event=on_event,
+        cache_key=cache_key,
+    )
+
+
+async def _publish_answer(
+    file_changes: PullRequestFileChanges,
+    answer: str,
+    review_id: int,
+    on_event: EventCallback,
+) -> None:
+    """Publish the complete review of a file as a single token event."""
+    await on_event(
+        ReviewEvent(
+            type=ReviewEventType.token,
+            review_id=review_id,
+            file_name=file_changes.filename,
+            content=answer,
         ),
     )
 
-    file_names = [file.filename for file in pull_request_file_changes_requests]
-    return ReviewResponse(
-        review_id=review.id,
-        review_contents=review_contents,
-        file_names=file_names,
+
+async def _finish_file_review(
+    file_changes: PullRequestFileChanges,
+    answer: str,
+    review_id: int,
+    on_event: EventCallback,
+    cache_key: str | None = None,
+) -> FileReview:
+    """Report a file as reviewed.
+
+    :param file_changes: The pull request file changes.
+    :param answer: The review content.
+    :param review_id: The review id, used to report progress.
+    :param on_event: Callback receiving the events of the review.
+    :param cache_key: The key to cache the review under, unless already cached.
+    :return: The file review.
+    """
+    if cache_key is not None and config.review_cache.enabled and answer:
+        background_writes.submit(
+            review_cache.set(cache_key, answer),
+            name=f"review-cache-{cache_key[:12]}",
+        )
+
+    await on_event(
+        ReviewEvent(
+            type=ReviewEventType.file_done,
+            review_id=review_id,
+            file_name=file_changes.filename,
+        ),
     )
+    return FileReview(file_name=file_changes.filename, content=answer)
 
 
-async def _create_review_task(
+async def _carry_over_file_review(
+    file_changes: PullRequestFileChanges,
+    carried_over_from_id: int,
+    review_id: int,
+    on_event: EventCallback,
+) -> FileReview:
+    """Carry over the review of a file that did not change since the last review.
+
+    :param file_changes: The pull request file changes.
+    :param carried_over_from_id: The ID of the file review to refer to.
+    :param review_id: The review id, used to report progress.
+    :param on_event: Callback receiving the events of the review.
+    :return: The file review, referring to the earlier one.
+    """
+    await on_event(
+        ReviewEvent(
+            type=ReviewEventType.file_carried_over,
+            review_id=review_id,
+            file_name=file_changes.filename,
+        ),
+    )
+    return FileReview(
+        file_name=file_changes.filename,
+        carried_over_from_id=carried_over_from_id,
+    )
+
+
+async def _reject_file_review(
+    file_changes: PullRequestFileChanges,
+    reason: str,
+    review_id: int,
+    on_event: EventCallback,
+) -> FileReview:
+    """Reject a file without asking the LLM.
+
+    :param file_changes: The pull request file changes.
+    :param reason: Why the file is rejected.
+    :param review_id: The review id, used to report progress.
+    :param on_event: Callback receiving the events of the review.
+    :return: The rejected file review.
+    """
+    logger.info(f"Reject {file_changes.filename} of review {review_id}: {reason}")
+    await on_event(
+        ReviewEvent(
+            type=ReviewEventType.file_rejected,
+            review_id=review_id,
+            file_name=file_changes.filename,
+            content=reason,
+        ),
+    )
+    return FileReview(
+        file_name=file_changes.filename,
+        status=FileReviewStatus.rejected,
+        reason=reason,
+    )
+
+
+async def _skip_file_review(
     file_changes: PullRequestFileChanges,
-    semaphore: asyncio.Semaphore,
+    reason: str,
+    review_id: int,
+    on_event: EventCallback,
+) -> FileReview:
+    """Skip a file excluded by the file filter, without asking the LLM.
+
+    :param file_changes: The pull request file changes.
+    :param reason: Why the file is skipped.
+    :param review_id: The review id, used to report progress.
+    :param on_event: Callback receiving the events of the review.
+    :return: The skipped file review.
+    """
+    logger.debug(f"Skip {file_changes.filename} of review {review_id}: {reason}")
+    await on_event(
+        ReviewEvent(
+            type=ReviewEventType.file_skipped,
+            review_id=review_id,
+            file_name=file_changes.filename,
+            content=reason,
+        ),
+    )
+    return FileReview(
+        file_name=file_changes.filename,
+        status=FileReviewStatus.skipped,
+        reason=reason,
+    )
+
+
+async def _fail_file_review(
+    file_changes: PullRequestFileChanges,
+    error: BaseException,
+    review_id: int,
+    on_event: EventCallback,
+) -> FileReview:
+    """Record a file whose review failed.
+
+    :param file_changes: The pull request file changes.
+    :param error: Why the review failed.
+    :param review_id: The review id.
+    :param on_event: Callback receiving the events of the review.
+    :return: The failed file review.
+    """
+    logger.error(
+        f"Failed to review {file_changes.filename} for review {review_id}.",
+        exc_info=error,
+    )
+    reason = f"Review failed: {type(error).__name__}."
+    await on_event(
+        ReviewEvent(
+            type=ReviewEventType.file_failed,
+            review_id=review_id,
+            file_name=file_changes.filename,
+            content=reason,
+        ),
+    )
+    return FileReview(
+        file_name=file_changes.filename,
+        status=FileReviewStatus.failed,
+        reason=reason,
+    )
+
+
+async def _review_patch(
+    file_changes: PullRequestFileChanges,
+    prompts: tuple[str, str],
+    review_id: int,
+    on_event: EventCallback,
 ) -> str:
-    """Create a review task for a single file.
+    """Ask the LLM to review the patch of a file.
+
+    Patches too large for a single request are split on hunk boundaries. The
+    chunks are reviewed concurrently and their reviews merged in order. If a
+    chunk fails, the others are cancelled and the error is raised.
+
+    :param file_changes: The pull request file changes.
+    :param prompts: The system prompt and the user prompt of the whole patch.
+    :param review_id: The review id.
+    :param on_event: Callback receiving the tokens as they are produced.
+    :return: The review content.
+    """
+    chunks = split_patch(file_changes.patch, max_tokens=config.max_chunk_tokens)
+    if len(chunks) <= 1:
+        return await _stream_file_review(
+            file_changes=file_changes,
+            prompts=prompts,
+            review_id=review_id,
+            on_event=on_event,
+        )
+
+    async def review_chunk(part: int, chunk: str) -> str:
+        chunk_changes = file_changes.model_copy(update={"patch": chunk})
+        return await _stream_file_review(
+            file_changes=chunk_changes,
+            prompts=ReviewPullRequest.get_prompts(request=chunk_changes),
+            review_id=review_id,
+            on_event=on_event,
+            part=part,
+        )
+
+    chunk_tasks = [
+        asyncio.create_task(review_chunk(part, chunk))
+        for part, chunk in enumerate(chunks, start=1)
+    ]
+    try:
+        await asyncio.wait(chunk_tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for chunk_task in chunk_tasks:
+            if chunk_task.done() and (error := chunk_task.exception()) is not None:
+                raise error
+        chunk_reviews = [chunk_task.result() for chunk_task in chunk_tasks]
+    finally:
+        # The review of the file fails with any of its chunks, or is cancelled;
+        # the remaining chunks would spend LLM requests for nothing.
+        for chunk_task in chunk_tasks:
+            chunk_task.cancel()
+        await asyncio.gather(*chunk_tasks, return_exceptions=True)
+    return "\n\n".join(
+        f"### Part {part} of {len(chunks)}\n\n{chunk_review}"
+        for part, chunk_review in enumerate(chunk_reviews, start=1)
+    )
+
+
+async def _stream_file_review(
+    file_changes: PullRequestFileChanges,
+    prompts: tuple[str, str],
+    review_id: int,
+    on_event: EventCallback,
+    part: int | None = None,
+) -> str:
+    """Ask the LLM to review a file, publishing the tokens as they arrive.
 
     :param file_changes: The pull request file changes.
-    :param semaphore: The semaphore.
+    :param prompts: The system prompt and the user prompt.
+    :param review_id: The review id.
+    :param on_event: Callback receiving the tokens as they are produced.
+    :param part: The part of the file under review, if it is split.
     :return: The review content.
     """
     answer = ""
-    async with semaphore:
-        review_content_iterator = await ReviewPullRequest.arun(request=file_changes)
+    review_content_iterator = await ReviewPullRequest.arun(
+        request=file_changes,
+        prompts=prompts,
+    )
 
-        async for review_content in review_content_iterator:
-            answer += review_content
+    async for review_content in review_content_iterator:
+        answer += review_content
+        await on_event(
+            ReviewEvent(
+                type=ReviewEventType.token,
+                review_id=review_id,
+                file_name=file_changes.filename,
+                part=part,
+                content=review_content,
+            ),
+        )
 
     return answer
 
 
-async def list_repositories() -> list[Repository]:
-    """List repositories."""
-    return await pull_request_repository.list_repositories()
+async def list_repositories(
+    limit: int,
+    after: int | None = None,
+    repository_name: str | None = None,
+) -> Page[Repository]:
+    """List a page of repositories."""
+    return await pull_request_repository.list_repositories(
+        limit=limit,
+        after=after,
+        repository_name=repository_name,
+    )
 
 
 async def delete_repository(repository_id: int) -> None:
@@ -127,11 +1187,24 @@ async def get_repository(repository_id: int) -> Repository:
 async def add_repository(
     repository_name: str,
     github_url: str | None = None,
+    file_filter: FileFilterConfig | None = None,
 ) -> Repository:
     """Add a repository."""
     return await pull_request_repository.add_repository(
         repository_name=repository_name,
         github_url=github_url,
+        file_filter=file_filter,
+    )
+
+
+async def update_file_filter(
+    repository_id: int,
+    file_filter: FileFilterConfig | None,
+) -> None:
+    """Update the file filter of a repository."""
+    return await pull_request_repository.update_file_filter(
+        repository_id=repository_id,
+        file_filter=file_filter,
     )
 
 
@@ -146,9 +1219,17 @@ async def add_pull_request(
     )
 
 
-async def get_pull_requests(repository_id: int) -> list[PullRequest]:
-    """Get a list of pull requests."""
-    return await pull_request_repository.get_pull_requests(repository_id=repository_id)
+async def get_pull_requests(
+    repository_id: int,
+    limit: int,
+    after: int | None = None,
+) -> Page[PullRequest]:
+    """Get a page of pull requests."""
+    return await pull_request_repository.get_pull_requests(
+        repository_id=repository_id,
+        limit=limit,
+        after=after,
+    )
 
 
 async def get_pull_request(
@@ -165,11 +1246,30 @@ async def get_pull_request(
 async def get_reviews(
     repository_id: int,
     pull_request_id: int,
-) -> list[Review]:
-    """Get a list of reviews."""
+    limit: int,
+    after: int | None = None,
+    review_status: ReviewStatus | None = None,
+) -> Page[Review]:
+    """Get a page of reviews."""
     return await pull_request_repository.get_reviews(
         repository_id=repository_id,
         pull_request_id=pull_request_id,
+        limit=limit,
+        after=after,
+        review_status=review_status,
+    )
+
+
+async def get_review_status(
+    repository_id: int,
+    pull_request_id: int,
+    review_id: int,
+) -> Review:
+    """Get the status of a review."""
+    return await pull_request_repository.get_review_status(
+        repository_id=repository_id,
+        pull_request_id=pull_request_id,
+        review_id=review_id,
     )
 
 
@@ -0,0 +1,103 @@
+"""Content-addressed cache of file reviews."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Self
+
+from api.config import config
+from api.reviewer.repositories import pull_request_repository
+from api.utils.metrics import metrics
+
+
+def get_review_cache_key(
+    filename: str,
+    patch: str,
+    system_prompt: str,
+    user_prompt: str,
+) -> str:
+    """Get the key of a file review.
+
+    The key covers everything that determines the review: the file, its patch,
+    the rendered prompts and the model that answers them.
+
+    :param filename: The name of the reviewed file.
+    :param patch: The patch of the reviewed file.
+    :param system_prompt: The rendered system prompt.
+    :param user_prompt: The rendered user prompt.
+    :return: Hex digest of the SHA-256 hash of the review inputs.
+    """
+    inputs = {
+        "filename": filename,
+        "patch": patch,
+        "system_prompt": system_prompt,
+        "user_prompt": user_prompt,
+        "llm_provider": config.llm_provider,
+        "llm_model": config.provider_to_llm[config.llm_provider],
+        "llm_config": config.llm_config or {},
+    }
+    serialized_inputs = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(serialized_inputs.encode("utf-8")).hexdigest()
+
+
+class ReviewCache:
+    """Two-tier cache of file reviews.
+
+    An in-process LRU tier answers repeated lookups without a round trip, while
+    the database tier is shared by all workers.
+    """
+
+    def __init__(self: Self, max_memory_entries: int) -> None:
+        """Initialize the cache.
+
+        :param max_memory_entries: Number of reviews kept in process memory.
+        """
+        self._max_memory_entries = max_memory_entries
+        self._memory: OrderedDict[str, str] = OrderedDict()
+
+    async def get(self: Self, key: str) -> str | None:
+        """Get a cached review.
+
+        :param key: The key of the review.
+        :return: The review content, or None on a miss.
+        """
+        if (content := self._memory.get(key)) is not None:
+            self._memory.move_to_end(key)
+            metrics.increment("review_cache.memory.hits")
+            return content
+        metrics.increment("review_cache.memory.misses")
+
+        content = await pull_request_repository.get_cached_file_review(key=key)
+        if content is None:
+            metrics.increment("review_cache.database.misses")
+            return None
+
+        metrics.increment("review_cache.database.hits")
+        self._remember(key, content)
+        return content
+
+    async def set(self: Self, key: str, content: str) -> None:
+        """Cache a review.
+
+        :param key: The key of the review.
+        :param content: The review content.
+        """
+        self._remember(key, content)
+        await pull_request_repository.add_cached_file_review(key=key, content=content)
+
+    def _remember(self: Self, key: str, content: str) -> None:
+        """Put a review in the in-process tier, evicting the least recently used."""
+        self._memory[key] = content
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def __len__(self: Self) -> int:
+        """Count the reviews in the in-process tier."""
+        return len(self._memory)
+
+
+review_cache = ReviewCache(max_memory_entries=config.review_cache.max_memory_entries)
+metrics.register_gauge("review_cache.memory.size", lambda: len(review_cache))
@@ -0,0 +1,88 @@
+"""Managed execution of background work."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Coroutine, Self
+
+logger = logging.getLogger(__name__)
+
+_executors: list[BackgroundExecutor] = []
+
+
+class BackgroundExecutor:
+    """Run coroutines in the background with bounded concurrency.
+
+    Submitted tasks are tracked until they finish, such that they are neither
+    garbage-collected while running nor lost on shutdown.
+    """
+
+    def __init__(self: Self, name: str, max_concurrency: int) -> None:
+        """Initialize the executor.
+
+        :param name: Name of the executor, used for logging.
+        :param max_concurrency: Maximum number of tasks running at the same time.
+        """
+        self.name = name
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        _executors.append(self)
+
+    @property
+    def pending(self: Self) -> int:
+        """Number of tasks that are queued or running."""
+        return len(self._tasks)
+
+    def submit(
+        self: Self,
+        coroutine: Coroutine[Any, Any, Any],
+        name: str | None = None,
+    ) -> asyncio.Task:
+        """Schedule a coroutine in the background.
+
+        :param coroutine: The coroutine to run.
+        :param name: Name of the task.
+        :return: The scheduled task.
+        """
+        task = asyncio.create_task(self._run(coroutine), name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    async def _run(self: Self, coroutine: Coroutine[Any, Any, Any]) -> Any:
+        """Run a coroutine once a slot is available."""
+        async with self._semaphore:
+            return await coroutine
+
+    def _on_done(self: Self, task: asyncio.Task) -> None:
+        """Forget a finished task and log its failure, if any."""
+        self._tasks.discard(task)
+        if not task.cancelled() and (exception := task.exception()) is not None:
+            logger.error(
+                f"Background task {task.get_name()} of {self.name} failed.",
+                exc_info=exception,
+            )
+
+    async def shutdown(self: Self, timeout: float | None = None) -> None:
+        """Wait for pending tasks to finish and cancel the ones that do not.
+
+        :param timeout: Seconds to wait before cancelling the remaining tasks.
+        """
+        if not self._tasks:
+            return
+
+        logger.info(f"Draining {len(self._tasks)} background tasks of {self.name}.")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def shutdown_background_executors(timeout: float | None = None) -> None:
+    """Shut down all background executors.
+
+    :param timeout: Seconds each executor may take to drain its tasks.
+    """
+    for executor in _executors:
+        await executor.shutdown(timeout=timeout)
@@ -0,0 +1,133 @@
+"""Batched writes to the database."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Generic, Self, TypeVar
+
+from api.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_writers: list[BatchWriter] = []
+
+
+class BatchWriter(Generic[T]):
+    """Group rows written concurrently into few bulk writes.
+
+    The first row waiting opens a batch, which is flushed after flush_interval
+    seconds or once it holds max_batch_size rows. Writers wait until their rows
+    are flushed, such that they know their rows are persisted.
+    """
+
+    def __init__(
+        self: Self,
+        name: str,
+        flush: Callable[[list[T]], Awaitable[None]],
+        flush_interval: float,
+        max_batch_size: int,
+    ) -> None:
+        """Initialize the writer.
+
+        :param name: Name of the writer, used for logging and metrics.
+        :param flush: Function writing a batch of rows in one go.
+        :param flush_interval: Seconds a batch collects rows before it is flushed.
+        :param max_batch_size: Number of rows flushed at most in one go.
+        """
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._flush = flush
+        self._queue: asyncio.Queue[tuple[list[T], asyncio.Future]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        _writers.append(self)
+
+        metrics.register_gauge(f"{name}.queued", self._queue.qsize)
+
+    async def write(self: Self, rows: list[T]) -> None:
+        """Write rows with the next batch and wait until it is flushed.
+
+        :param rows: The rows to write.
+        :raises Exception: The error of the flush, if it failed.
+        """
+        if not rows:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((rows, future))
+        # The rows are flushed even if the writer stops waiting for them.
+        await asyncio.shield(future)
+
+    async def _run(self: Self) -> None:
+        """Flush batches as long as rows are written."""
+        while True:
+            batch = [await self._queue.get()]
+            batch_size = len(batch[0][0])
+            deadline = time.monotonic() + self.flush_interval
+            while batch_size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except TimeoutError:
+                    break
+                batch.append(entry)
+                batch_size += len(entry[0])
+
+            await self._flush_batch(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _flush_batch(
+        self: Self,
+        batch: list[tuple[list[T], asyncio.Future]],
+    ) -> None:
+        """Flush a batch and report the outcome to its writers."""
+        rows = [row for batch_rows, _ in batch for row in batch_rows]
+        try:
+            await self._flush(rows)
+        except Exception as e:
+            logger.exception(f"Failed to flush {len(rows)} rows of {self.name}.")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            metrics.increment(f"{self.name}.flushes")
+            metrics.increment(f"{self.name}.rows", len(rows))
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def close(self: Self, timeout: float | None = None) -> None:
+        """Flush the rows written so far and stop the writer.
+
+        :param timeout: Seconds to wait for the last flushes.
+        """
+        if self._task is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except TimeoutError:
+            logger.warning(
+                f"Dropping {self._queue.qsize()} pending writes of {self.name}.",
+            )
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+async def close_batch_writers(timeout: float | None = None) -> None:
+    """Flush and stop all batch writers.
+
+    :param timeout: Seconds each writer may take to flush its pending rows.
+    """
+    for writer in _writers:
+        await writer.close(timeout=timeout)
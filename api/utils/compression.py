@@ -0,0 +1,147 @@
+"""Compression of stored texts with zstd."""
+
+from __future__ import annotations
+
+import logging
+from functools import cache
+from pathlib import Path
+from typing import Self
+
+from api.config import config, register_reload_hook
+from configs import CONFIGS_DIRECTORY
+
+# zstd is optional; without it, texts are stored uncompressed.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DICTIONARY_SUFFIX = ".zdict"
+
+
+class ZstdCodec:
+    """Compress texts with zstd, optionally with a trained dictionary.
+
+    Small, similar texts compress far better with a dictionary trained on
+    samples of them. Dictionaries are files named by their ID in the dictionary
+    directory. The ID is recorded in every compressed frame, such that texts
+    stay readable after a new dictionary is configured, as long as the old one
+    is kept.
+    """
+
+    def __init__(
+        self: Self,
+        level: int,
+        dictionary_directory: Path,
+        dictionary_id: int | None = None,
+    ) -> None:
+        """Initialize the codec.
+
+        :param level: The zstd compression level.
+        :param dictionary_directory: The directory of the dictionaries.
+        :param dictionary_id: The ID of the dictionary to compress with, if any.
+        """
+        self.level = level
+        self.dictionary_directory = dictionary_directory
+        self.dictionary_id = dictionary_id
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = {}
+        self._compressor: zstandard.ZstdCompressor | None = None
+        self._decompressors: dict[int, zstandard.ZstdDecompressor] = {}
+
+    def compress(self: Self, text: str) -> bytes:
+        """Compress a text.
+
+        :param text: The text.
+        :return: The zstd frame.
+        """
+        if self._compressor is None:
+            self._compressor = zstandard.ZstdCompressor(
+                level=self.level,
+                dict_data=(
+                    self._get_dictionary(self.dictionary_id)
+                    if self.dictionary_id
+                    else None
+                ),
+            )
+        return self._compressor.compress(text.encode("utf-8"))
+
+    def decompress(self: Self, data: bytes) -> str:
+        """Decompress a text, with the dictionary it was compressed with.
+
+        :param data: The zstd frame.
+        :return: The text.
+        """
+        dictionary_id = zstandard.get_frame_parameters(data).dict_id
+        if (decompressor := self._decompressors.get(dictionary_id)) is None:
+            decompressor = self._decompressors[dictionary_id] = (
+                zstandard.ZstdDecompressor(
+                    dict_data=(
+                        self._get_dictionary(dictionary_id) if dictionary_id else None
+                    ),
+                )
+            )
+        return decompressor.decompress(data).decode("utf-8")
+
+    def _get_dictionary(
+        self: Self, dictionary_id: int
+    ) -> zstandard.ZstdCompressionDict:
+        """Load a dictionary by ID.
+
+        :raises FileNotFoundError: If the dictionary is not in the directory.
+        """
+        if (dictionary := self._dictionaries.get(dictionary_id)) is None:
+            path = self.dictionary_directory / f"{dictionary_id}{DICTIONARY_SUFFIX}"
+            dictionary = self._dictionaries[dictionary_id] = (
+                zstandard.ZstdCompressionDict(path.read_bytes())
+            )
+        return dictionary
+
+
+def train_dictionary(samples: list[str], size: int, directory: Path) -> int:
+    """Train a dictionary on sample texts and save it.
+
+    :param samples: The sample texts, e.g. a few thousand recent reviews.
+    :param size: The size of the dictionary in bytes.
+    :param directory: The directory to save the dictionary in.
+    :return: The ID of the dictionary.
+    """
+    dictionary = zstandard.train_dictionary(
+        size,
+        [sample.encode("utf-8") for sample in samples],
+    )
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{dictionary.dict_id()}{DICTIONARY_SUFFIX}"
+    path.write_bytes(dictionary.as_bytes())
+    return dictionary.dict_id()
+
+
+@cache
+def get_file_review_codec() -> ZstdCodec | None:
+    """Get the codec of file review contents, as configured.
+
+    The codec also decompresses contents stored while compression was enabled,
+    should it be disabled since.
+
+    :return: The codec, or None if the zstandard package is missing.
+    """
+    storage_config = config.file_review_storage
+    codec = None
+    if zstandard is None:
+        if storage_config.compression == "zstd":
+            logger.warning(
+                "Compressing file reviews requires the zstandard package, "
+                "storing them uncompressed.",
+            )
+    else:
+        codec = ZstdCodec(
+            level=storage_config.level,
+            dictionary_directory=CONFIGS_DIRECTORY
+            / storage_config.dictionary_directory,
+            dictionary_id=storage_config.dictionary_id,
+        )
+    return codec
+
+
+register_reload_hook(get_file_review_codec.cache_clear)
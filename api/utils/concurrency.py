@@ -0,0 +1,244 @@
+"""Adaptive concurrency control."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Self, TypeVar
+
+from api.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Permit:
+    """A slot of an adaptive limiter, held while a call runs."""
+
+    def __init__(self: Self) -> None:
+        """Initialize the permit when its call starts."""
+        self.started_at = time.monotonic()
+        self.latency: float | None = None
+
+    def mark_latency(self: Self) -> None:
+        """Record the latency of the call, e.g. on its first streamed token.
+
+        Only the first mark counts. Unmarked calls count their whole duration.
+        """
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started_at
+
+
+class AdaptiveLimiter:
+    """Limit concurrent calls, adapting the limit to how the callee copes.
+
+    The limit follows additive increase, multiplicative decrease: it grows by
+    one for every limit-many calls that succeed within the latency tolerance
+    while the limit is nearly used up. Under light load the limit is not
+    tested, hence it does not grow.
+    It shrinks by the backoff ratio when a call is rejected as overloaded, e.g.
+    rate limited, and slightly when calls get slow compared to the lowest
+    latency observed. Calls started before a decrease do not decrease the limit
+    again.
+    """
+
+    # Shrink factor of the limit when calls get slow.
+    LATENCY_BACKOFF_RATIO = 0.9
+    # Rate at which the baseline latency drifts up towards observed latencies.
+    BASELINE_DRIFT = 0.01
+    # Share of the limit in flight above which successful calls grow the limit.
+    GROWTH_UTILIZATION = 0.8
+
+    def __init__(
+        self: Self,
+        name: str,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: float = 2.0,
+        is_overload: Callable[[BaseException], bool] = lambda _: False,
+    ) -> None:
+        """Initialize the limiter.
+
+        :param name: Name of the limiter, used for logging and metrics.
+        :param initial_limit: Number of concurrent calls allowed at first.
+        :param min_limit: Lowest number of concurrent calls allowed.
+        :param max_limit: Highest number of concurrent calls allowed.
+        :param backoff_ratio: Shrink factor of the limit on overload.
+        :param latency_tolerance: Ratio to the baseline latency above which
+            calls count as slow.
+        :param is_overload: Whether an exception raised by a call signals overload.
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self._is_overload = is_overload
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._queued = 0
+        self._baseline_latency: float | None = None
+        self._last_decrease_at = 0.0
+        self._condition = asyncio.Condition()
+
+        metrics.register_gauge(f"{name}.limit", lambda: self.limit)
+        metrics.register_gauge(f"{name}.in_flight", lambda: self.in_flight)
+        metrics.register_gauge(f"{name}.queued", lambda: self.queued)
+
+    @property
+    def limit(self: Self) -> int:
+        """Current number of concurrent calls allowed."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self: Self) -> int:
+        """Number of calls running."""
+        return self._in_flight
+
+    @property
+    def queued(self: Self) -> int:
+        """Number of calls waiting for a slot."""
+        return self._queued
+
+    def configure(
+        self: Self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        backoff_ratio: float,
+        latency_tolerance: float,
+    ) -> None:
+        """Apply new settings, restarting from the initial limit.
+
+        :param initial_limit: Number of concurrent calls allowed from now on.
+        :param min_limit: Lowest number of concurrent calls allowed.
+        :param max_limit: Highest number of concurrent calls allowed.
+        :param backoff_ratio: Shrink factor of the limit on overload.
+        :param latency_tolerance: Ratio to the baseline latency above which
+            calls count as slow.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+
+    @asynccontextmanager
+    async def acquire(self: Self) -> AsyncIterator[Permit]:
+        """Wait for a slot and hold it while the call runs.
+
+        :return: The permit of the call, to mark its latency with.
+        """
+        async with self._condition:
+            self._queued += 1
+            try:
+                await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            finally:
+                self._queued -= 1
+            self._in_flight += 1
+
+        permit = Permit()
+        try:
+            yield permit
+        except BaseException as e:
+            if isinstance(e, Exception) and self._is_overload(e):
+                self._decrease(permit, self.backoff_ratio)
+            raise
+        else:
+            self._on_success(permit)
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _on_success(self: Self, permit: Permit) -> None:
+        """Adjust the limit to the latency of a successful call."""
+        permit.mark_latency()
+        latency = permit.latency or 0.0
+        if self._baseline_latency is None or latency < self._baseline_latency:
+            self._baseline_latency = latency
+        else:
+            self._baseline_latency += (
+                latency - self._baseline_latency
+            ) * self.BASELINE_DRIFT
+
+        if latency > self._baseline_latency * self.latency_tolerance:
+            self._decrease(permit, self.LATENCY_BACKOFF_RATIO)
+        elif self._in_flight >= self.limit * self.GROWTH_UTILIZATION:
+            # The call still counts as in flight.
+            self._limit = min(self._limit + 1 / self._limit, float(self.max_limit))
+
+    def _decrease(self: Self, permit: Permit, ratio: float) -> None:
+        """Shrink the limit, unless it already shrank since the call started."""
+        if permit.started_at < self._last_decrease_at:
+            return
+        self._last_decrease_at = time.monotonic()
+        previous_limit = self.limit
+        self._limit = max(self._limit * ratio, float(self.min_limit))
+        if self.limit != previous_limit:
+            logger.info(
+                f"Decrease the concurrency limit of {self.name} to {self.limit}.",
+            )
+
+
+class BoundedThreadPool:
+    """Run blocking functions in threads, off the event loop.
+
+    At most max_workers functions run at a time. Further calls wait on the
+    event loop, rather than in the queue of the thread pool, such that
+    cancelled calls never start.
+    """
+
+    def __init__(self: Self, name: str, max_workers: int) -> None:
+        """Initialize the pool.
+
+        :param name: Name of the pool, used for its threads and metrics.
+        :param max_workers: Number of functions running at the same time.
+        """
+        self.name = name
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=name,
+        )
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._in_flight = 0
+        self._queued = 0
+
+        metrics.register_gauge(f"{name}.in_flight", lambda: self._in_flight)
+        metrics.register_gauge(f"{name}.queued", lambda: self._queued)
+
+    async def run(self: Self, function: Callable[..., T], *args: Any) -> T:
+        """Run a blocking function in a thread of the pool.
+
+        :param function: The function to run.
+        :param args: The arguments of the function.
+        :return: The result of the function.
+        """
+        queued_at = time.monotonic()
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+        metrics.increment(f"{self.name}.wait_seconds", time.monotonic() - queued_at)
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                function,
+                *args,
+            )
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    def shutdown(self: Self) -> None:
+        """Stop the threads once the running functions return."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
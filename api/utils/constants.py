@@ -18,6 +18,7 @@ class Tools(StrEnum):
     """Tools accomplish steps in a chain."""
 
     REVIEW_PULL_REQUEST = "review_pull_request"
+    REVIEW_PULL_REQUEST_BATCH = "review_pull_request_batch"
 
 
 class LLMProvider(StrEnum):
@@ -1,18 +1,23 @@
 """Database utilities."""
 
 import logging
+import time
+import uuid
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, TypeVar
+from typing import Any, AsyncGenerator, TypeVar
 
 import sqlalchemy
 from box import Box
 from pydantic import BaseModel
 from sqlalchemy import engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
 from api.common.orm.base import Base
 from api.config import config
+from api.utils.metrics import metrics
 
 logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
 
@@ -33,9 +38,50 @@ def create_connection_url(database_config: Box) -> engine.url.URL:
     )
 
 
+def get_engine_options(database_config: Box) -> dict[str, Any]:
+    """Get the options of the engine from a database configuration.
+
+    In PgBouncer mode, connections are pooled by PgBouncer instead of the
+    engine, and prepared statements are neither cached nor reused across
+    transactions, which PgBouncer's transaction pooling does not support.
+
+    :param database_config: the database configuration.
+    :return: the keyword arguments of `create_async_engine`.
+    """
+    engine_config = database_config.engine
+    options: dict[str, Any] = {
+        "echo": engine_config.echo,
+        "pool_pre_ping": engine_config.pool_pre_ping,
+    }
+    connect_args: dict[str, Any] = {}
+    is_asyncpg = database_config.dialect.endswith("+asyncpg")
+
+    if engine_config.pgbouncer:
+        options["poolclass"] = NullPool
+        if is_asyncpg:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: (
+                f"__asyncpg_{uuid.uuid4()}__"
+            )
+    else:
+        options["pool_size"] = engine_config.pool_size
+        options["max_overflow"] = engine_config.max_overflow
+        options["pool_timeout"] = engine_config.pool_timeout
+        options["pool_recycle"] = engine_config.pool_recycle
+        if is_asyncpg:
+            connect_args["prepared_statement_cache_size"] = (
+                engine_config.statement_cache_size
+            )
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
 async_engine: AsyncEngine = create_async_engine(
     url=create_connection_url(config.database),
-    echo=True,
+    **get_engine_options(config.database),
 )
 async_session = sessionmaker(
     async_engine,
@@ -44,10 +90,39 @@ async_session = sessionmaker(
 )
 
 
+def register_pool_metrics(pool: sqlalchemy.Pool) -> None:
+    """Expose the state of a connection pool as metrics.
+
+    :param pool: The connection pool.
+    """
+    if not isinstance(pool, QueuePool):
+        return
+    metrics.register_gauge("db.pool.size", pool.size)
+    metrics.register_gauge("db.pool.checked_out", pool.checkedout)
+    metrics.register_gauge("db.pool.checked_in", pool.checkedin)
+    metrics.register_gauge("db.pool.overflow", pool.overflow)
+
+
+register_pool_metrics(async_engine.pool)
+
+
 @asynccontextmanager
 async def database_session() -> AsyncGenerator[AsyncSession, None]:
-    """Provide a transactional scope around a series of operations."""
+    """Provide a transactional scope around a series of operations.
+
+    The connection is checked out of the pool up front, such that the time
+    waited for it is measured.
+    """
     async with async_session() as session:
+        started_at = time.monotonic()
+        try:
+            await session.connection()
+        except PoolTimeoutError:
+            metrics.increment("db.pool.timeouts")
+            raise
+        finally:
+            metrics.increment("db.pool.checkouts")
+            metrics.increment("db.pool.wait_seconds", time.monotonic() - started_at)
         yield session
 
 
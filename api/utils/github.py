@@ -0,0 +1,439 @@
+"""Github API client."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Self
+from urllib.parse import urlsplit
+
+import httpx
+
+from api.config import config
+from api.utils.metrics import metrics
+from api.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    is_transient_error,
+    retry,
+)
+
+if TYPE_CHECKING:
+    from box import Box
+
+logger = logging.getLogger(__name__)
+
+GITHUB_HOST = "github.com"
+GITHUB_API_HOST = "api.github.com"
+# Seconds to wait after a secondary rate limit that does not say how long.
+SECONDARY_RATE_LIMIT_WAIT = 60.0
+# Waits for the rate limit budget longer than this many seconds are logged.
+SLOW_BUDGET_WAIT = 60.0
+# Seconds after which Github restores the primary rate limit budget.
+RATE_LIMIT_WINDOW = 3600.0
+
+
+def get_api_base_url(github_url: str) -> str:
+    """Get the base URL of the REST API of a Github instance.
+
+    Both github.com and Github Enterprise instances are supported, whether given
+    by their web URL (e.g. https://github.yourcompany.com) or their API URL
+    (e.g. github.yourcompany.com/api/v3).
+
+    :param github_url: URL of the Github instance.
+    :return: Base URL of the REST API, without trailing slash.
+    """
+    split_url = urlsplit(github_url if "://" in github_url else f"https://{github_url}")
+    scheme = split_url.scheme or "https"
+    host = split_url.netloc
+    path = split_url.path.rstrip("/")
+
+    if host in (GITHUB_HOST, GITHUB_API_HOST):
+        return f"{scheme}://{GITHUB_API_HOST}"
+    if not path.endswith("/api/v3"):
+        path = f"{path}/api/v3"
+    return f"{scheme}://{host}{path}"
+
+
+class GithubRateLimitError(httpx.HTTPError):
+    """Github keeps rejecting a request for a rate limit."""
+
+    def __init__(self: Self, message: str, retry_after: float) -> None:
+        """Initialize the error.
+
+        :param message: The error message.
+        :param retry_after: Seconds until the budget is expected back.
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GithubUnavailableError(httpx.HTTPError):
+    """Requests to Github are suspended after repeated failures."""
+
+
+class RateLimitBudget:
+    """Rate limit budget of a Github token on a host.
+
+    The budget is read from the rate limit headers of every response. Requests
+    are scheduled one after the other against it: once few requests remain they
+    are spread evenly until the reset, and once only the reserve remains they
+    queue for the reset. Queued requests are released one by one at the pace
+    spreading the restored budget over the next window, rather than all at once.
+    """
+
+    def __init__(self: Self, host: str, token_id: str) -> None:
+        """Initialize an unknown budget.
+
+        :param host: The Github API host.
+        :param token_id: Identifier of the token, which is not the token itself.
+        """
+        self.host = host
+        self.token_id = token_id
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at: float | None = None
+        self.blocked_until = 0.0
+        self._next_request_at = 0.0
+
+        metric_prefix = f"github.rate_limit.{host}.{token_id}"
+        metrics.register_gauge(
+            f"{metric_prefix}.remaining",
+            lambda: -1 if self.remaining is None else self.remaining,
+        )
+        metrics.register_gauge(
+            f"{metric_prefix}.limit",
+            lambda: -1 if self.limit is None else self.limit,
+        )
+        metrics.register_gauge(
+            f"{metric_prefix}.reset_in",
+            lambda: max((self.reset_at or 0) - time.time(), 0),
+        )
+
+    def schedule(self: Self, reserve: int, slowdown_threshold: int) -> float:
+        """Schedule a request against the budget.
+
+        :param reserve: Requests kept in reserve, which wait for the reset.
+        :param slowdown_threshold: Remaining requests below which requests are
+            spread until the reset.
+        :return: Seconds to wait before sending the request.
+        """
+        now = time.time()
+        start_at = max(now, self.blocked_until)
+        if (
+            self.remaining is not None
+            and self.reset_at is not None
+            and self.reset_at > start_at
+        ):
+            if self.remaining <= reserve:
+                interval = RATE_LIMIT_WINDOW / self.limit if self.limit else 0.0
+                start_at = max(self.reset_at, self._next_request_at)
+                self._next_request_at = start_at + interval
+            else:
+                if self.remaining < slowdown_threshold:
+                    interval = (self.reset_at - now) / (self.remaining - reserve)
+                    start_at = max(start_at, self._next_request_at)
+                    self._next_request_at = start_at + interval
+                self.remaining -= 1
+        return start_at - now
+
+    def update(self: Self, response: httpx.Response) -> None:
+        """Read the budget from the headers of a response.
+
+        :param response: The response.
+        """
+        headers = response.headers
+        if "X-RateLimit-Remaining" in headers:
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Limit" in headers:
+            self.limit = int(headers["X-RateLimit-Limit"])
+        if "X-RateLimit-Reset" in headers:
+            self.reset_at = float(headers["X-RateLimit-Reset"])
+
+    def block(self: Self, response: httpx.Response) -> None:
+        """Block requests after a response rejected by a rate limit.
+
+        Secondary rate limits say how long to wait in the Retry-After header.
+        Exhausted primary rate limits wait for the reset.
+
+        :param response: The rejected response.
+        """
+        if "Retry-After" in response.headers:
+            blocked_until = time.time() + float(response.headers["Retry-After"])
+        elif self.remaining == 0 and self.reset_at is not None:
+            blocked_until = self.reset_at
+        else:
+            blocked_until = time.time() + SECONDARY_RATE_LIMIT_WAIT
+        self.blocked_until = max(self.blocked_until, blocked_until)
+
+
+# Rate limit budgets per token and host. Github counts the requests of a token,
+# hence clients sharing a token share its budgets.
+_budgets: dict[tuple[str, str], RateLimitBudget] = {}
+
+
+def get_rate_limit_budget(token: str, host: str) -> RateLimitBudget:
+    """Get the rate limit budget of a token on a host.
+
+    :param token: The Github token.
+    :param host: The Github API host.
+    :return: The rate limit budget.
+    """
+    key = (token, host)
+    if key not in _budgets:
+        token_id = hashlib.sha256(token.encode()).hexdigest()[:8]
+        _budgets[key] = RateLimitBudget(host=host, token_id=token_id)
+    return _budgets[key]
+
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    """Check whether Github rejected a request for a rate limit.
+
+    :param response: The response.
+    :return: Whether the request was rejected by a primary or secondary rate limit.
+    """
+    if response.status_code not in (
+        httpx.codes.FORBIDDEN,
+        httpx.codes.TOO_MANY_REQUESTS,
+    ):
+        return False
+    return (
+        response.status_code == httpx.codes.TOO_MANY_REQUESTS
+        or "Retry-After" in response.headers
+        or response.headers.get("X-RateLimit-Remaining") == "0"
+    )
+
+
+class GithubClient:
+    """Client for the Github REST API.
+
+    A single client is shared by the whole application, such that requests reuse
+    pooled connections instead of paying a new TCP and TLS handshake each time.
+    Requests are scheduled against the rate limit budget of its token on each
+    host, such that bulk work slows down instead of failing. Transient errors
+    are retried, and requests to a host that keeps failing are suspended by its
+    circuit breaker.
+    """
+
+    def __init__(
+        self: Self,
+        token: str,
+        github_config: Box,
+        timeout: float,
+    ) -> None:
+        """Initialize the client.
+
+        :param token: Github token used to authenticate requests.
+        :param github_config: Github configuration.
+        :param timeout: Timeout of connecting to Github, in seconds.
+        """
+        self._token = token
+        self._config = github_config
+        self._timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+        self._circuit_breakers: dict[str, CircuitBreaker] = {}
+
+    @property
+    def client(self: Self) -> httpx.AsyncClient:
+        """Underlying HTTP client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self: Self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client."""
+        http2 = self._config.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requires the h2 package, using HTTP/1.1.")
+                http2 = False
+
+        return httpx.AsyncClient(
+            headers={
+                "Accept": "application/vnd.github+json",
+                "Authorization": f"Bearer {self._token}",
+                "X-GitHub-Api-Version": self._config.api_version,
+            },
+            limits=httpx.Limits(
+                max_connections=self._config.max_connections,
+                max_keepalive_connections=self._config.max_keepalive_connections,
+                keepalive_expiry=self._config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self._timeout, read=None),
+            http2=http2,
+        )
+
+    async def start(self: Self) -> None:
+        """Open the connection pool."""
+        _ = self.client
+
+    async def close(self: Self) -> None:
+        """Close the connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(
+        self: Self,
+        url: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> httpx.Response:
+        """Send a GET request to Github.
+
+        Conditional requests answered with 304 Not Modified are returned as is.
+        Requests wait for the rate limit budget, however long it takes, and are
+        retried after the wait Github asks for when they are rejected by a rate
+        limit.
+
+        :param url: Absolute URL of the resource.
+        :param params: Query parameters.
+        :param headers: Headers on top of the default ones.
+        :param timeout: Timeout of the request, in seconds, if not the default one.
+        :raises GithubRateLimitError: If Github keeps rejecting the request for a
+            rate limit.
+        :raises httpx.HTTPStatusError: If Github answers with an error.
+        :return: The response.
+        """
+        budget = get_rate_limit_budget(token=self._token, host=httpx.URL(url).host)
+        for _ in range(self._config.max_rate_limit_retries + 1):
+            response = await self._send(
+                url,
+                params=params,
+                headers=headers,
+                timeout=timeout,
+                budget=budget,
+            )
+            if not is_rate_limited(response):
+                break
+
+            metrics.increment("github.rate_limit.rejected")
+            budget.block(response)
+            logger.warning(
+                f"Github rate limit hit on {budget.host}, blocked for "
+                f"{budget.blocked_until - time.time():.0f} seconds.",
+            )
+        else:
+            message = f"Github rate limit exceeded on {budget.host}."
+            raise GithubRateLimitError(
+                message,
+                retry_after=max(budget.blocked_until - time.time(), 0),
+            )
+
+        if response.status_code != httpx.codes.NOT_MODIFIED:
+            response.raise_for_status()
+        return response
+
+    async def _send(
+        self: Self,
+        url: str,
+        params: dict[str, Any] | None,
+        headers: dict[str, str] | None,
+        timeout: float | None,
+        budget: RateLimitBudget,
+    ) -> httpx.Response:
+        """Send a GET request, retrying network errors and server errors.
+
+        Every attempt waits for and spends a request of the rate limit budget.
+
+        :param url: Absolute URL of the resource.
+        :param params: Query parameters.
+        :param headers: Headers on top of the default ones.
+        :param timeout: Timeout of the request, in seconds, if not the default one.
+        :param budget: The rate limit budget of the token on the host.
+        :raises GithubUnavailableError: If requests to the host are suspended.
+        :raises httpx.HTTPError: If the request still fails after the retries.
+        :return: The response.
+        """
+        circuit_breaker = self._get_circuit_breaker(httpx.URL(url).host)
+
+        async def send() -> httpx.Response:
+            await self._wait_for_budget(budget)
+            async with circuit_breaker.guard():
+                response = await self.client.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+                )
+                budget.update(response)
+                if response.is_server_error:
+                    response.raise_for_status()
+                return response
+
+        try:
+            return await retry(
+                send,
+                retry_config=config.resilience.retries,
+                is_retryable=is_transient_error,
+                name="github",
+            )
+        except CircuitOpenError as e:
+            raise GithubUnavailableError(str(e)) from e
+
+    def _get_circuit_breaker(self: Self, host: str) -> CircuitBreaker:
+        """Get the circuit breaker of a host."""
+        if host not in self._circuit_breakers:
+            self._circuit_breakers[host] = CircuitBreaker(
+                name=f"github.{host}",
+                is_failure=is_transient_error,
+                **config.resilience.circuit_breaker,
+            )
+        return self._circuit_breakers[host]
+
+    async def _wait_for_budget(self: Self, budget: RateLimitBudget) -> None:
+        """Wait until a request may be sent against a rate limit budget.
+
+        Requests are only sent from background jobs, hence they rather wait for
+        the reset of an exhausted budget, however long it takes, than fail.
+        Github restores primary budgets every hour, which bounds most waits.
+
+        :param budget: The rate limit budget.
+        """
+        delay = budget.schedule(
+            reserve=self._config.rate_limit_reserve,
+            slowdown_threshold=self._config.rate_limit_slowdown_threshold,
+        )
+        if delay > 0:
+            if delay > SLOW_BUDGET_WAIT:
+                logger.info(
+                    f"Github rate limit budget on {budget.host} is exhausted, "
+                    f"waiting {delay:.0f} seconds for the reset.",
+                )
+            metrics.increment("github.rate_limit.wait_seconds", delay)
+            await asyncio.sleep(delay)
+
+    async def iter_pages(
+        self: Self,
+        url: str,
+        params: dict[str, Any] | None = None,
+    ) -> AsyncIterator[httpx.Response]:
+        """Send GET requests for all pages of a paginated resource.
+
+        Pages are followed through the `Link` header until there is no next page.
+
+        :param url: Absolute URL of the first page.
+        :param params: Query parameters of the first page.
+        :raises httpx.HTTPStatusError: If Github answers with an error.
+        :return: Iterator over the responses of all pages.
+        """
+        next_url: str | None = url
+        while next_url is not None:
+            response = await self.get(next_url, params=params)
+            yield response
+
+            # The next link already carries the query parameters.
+            next_url = response.links.get("next", {}).get("url")
+            params = None
+
+
+github_client = GithubClient(
+    token=config.github_token,
+    github_config=config.github,
+    timeout=config.request_timeout,
+)
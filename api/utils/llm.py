@@ -1,5 +1,11 @@
+import asyncio
+import json
+import logging
+import time
 from typing import AsyncIterator
 
+import httpx
+import openai
 from box import Box
 from langchain_community.chat_models.openai import ChatOpenAI
 from langchain_core.language_models.chat_models import BaseChatModel
@@ -9,39 +15,258 @@ from langchain_core.messages import (
     SystemMessage,
 )
 
-from api.config import config
+from api.config import config, register_reload_hook
+from api.utils.concurrency import AdaptiveLimiter
 from api.utils.constants import LLMProvider
 from api.utils.exceptions import ConfigError
+from api.utils.metrics import metrics
+from api.utils.rate_limit import TokenBucket
+from api.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    hedged_stream,
+    is_transient_error,
+    retry_stream,
+)
+from api.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Chat models are expensive to construct, hence they are shared for the life of
+# the process.
+_chat_models: dict[tuple[str, str, str], BaseChatModel] = {}
+# One connection pool per provider, shared by all its chat models. Pools outlive
+# configuration reloads, which only rebuild the chat models.
+_http_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def get_http_client(llm_provider: str) -> httpx.AsyncClient:
+    """Get the pooled HTTP client of a provider, created on first use.
+
+    :param llm_provider: The provider.
+    :return: The HTTP client.
+    """
+    client = _http_clients.get(llm_provider)
+    if client is None or client.is_closed:
+        connections = config.llm_connections
+        client = _http_clients[llm_provider] = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=connections.max_connections,
+                max_keepalive_connections=connections.max_keepalive_connections,
+                keepalive_expiry=connections.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(config.request_timeout),
+        )
+    return client
+
+
+async def close_http_clients() -> None:
+    """Close the connection pools of the providers."""
+    for client in _http_clients.values():
+        await client.aclose()
+    _http_clients.clear()
 
 
 def get_chat_model(
-    llm_model: str = config.provider_to_llm[config.llm_provider],
-    llm_provider: str = config.llm_provider,
+    llm_model: str | None = None,
+    llm_provider: str | None = None,
     config: Box = config,
 ) -> BaseChatModel:
-    """Get the chat model."""
-    llm_type: type[BaseChatModel]
+    """Get the chat model.
+
+    Chat models are cached by provider, model and LLM configuration.
+
+    :param llm_model: The model, defaults to the configured one of the provider.
+    :param llm_provider: The provider, defaults to the configured one.
+    :param config: The configuration.
+    :return: The chat model.
+    """
+    llm_provider = llm_provider or config.llm_provider
+    llm_model = llm_model or config.provider_to_llm[llm_provider]
+    llm_config = config.llm_config or {}
+
+    key = (llm_provider, llm_model, json.dumps(llm_config, sort_keys=True, default=str))
+    if (chat_model := _chat_models.get(key)) is not None:
+        return chat_model
 
     match llm_provider:
         case LLMProvider.OPENAI:
-            llm_type = ChatOpenAI
+            create_chat_model = _create_openai_chat_model
         case _:
             message = f"Unknown LLM model: {llm_model}"
             raise ConfigError(message)
 
-    return llm_type(model=llm_model, **(config.llm_config or {}))
+    logger.info(f"Create chat model {llm_model} of {llm_provider}.")
+    chat_model = _chat_models[key] = create_chat_model(
+        llm_model=llm_model,
+        llm_config=llm_config,
+        http_client=get_http_client(llm_provider),
+    )
+    return chat_model
+
+
+def _create_openai_chat_model(
+    llm_model: str,
+    llm_config: dict,
+    http_client: httpx.AsyncClient,
+) -> ChatOpenAI:
+    """Create an OpenAI chat model sending its requests through a shared pool.
+
+    The model only takes a single HTTP client for its synchronous and
+    asynchronous OpenAI clients, hence its asynchronous client is replaced by
+    one on the shared pool, with the settings the model resolved. The client
+    does not retry by itself: rate limits must reach the LLM limiter, and
+    retries are left to the resilience layer.
+
+    :param llm_model: The model.
+    :param llm_config: The LLM configuration.
+    :param http_client: The HTTP client of the provider.
+    :return: The chat model.
+    """
+    chat_model = ChatOpenAI(model=llm_model, **llm_config)
+    chat_model.async_client = openai.AsyncOpenAI(
+        api_key=chat_model.openai_api_key,
+        organization=chat_model.openai_organization,
+        base_url=chat_model.openai_api_base,
+        timeout=chat_model.request_timeout,
+        max_retries=0,
+        default_headers=chat_model.default_headers,
+        default_query=chat_model.default_query,
+        http_client=http_client,
+    ).chat.completions
+    return chat_model
+
+
+def clear_chat_models() -> None:
+    """Forget the cached chat models, such that they are rebuilt on next use."""
+    _chat_models.clear()
+
+
+register_reload_hook(clear_chat_models)
+
+
+def is_rate_limit_error(exception: BaseException) -> bool:
+    """Check whether the LLM provider rejected a request for its rate limit."""
+    return getattr(exception, "status_code", None) == httpx.codes.TOO_MANY_REQUESTS
+
+
+# All LLM requests of the process share a single adaptive concurrency limit.
+llm_limiter = AdaptiveLimiter(
+    name="llm_limiter",
+    is_overload=is_rate_limit_error,
+    **config.llm_concurrency,
+)
+
+
+def configure_llm_limiter() -> None:
+    """Apply the configured concurrency settings to the LLM limiter."""
+    llm_limiter.configure(**config.llm_concurrency)
+
+
+register_reload_hook(configure_llm_limiter)
+
+# Requests and tokens per minute budgets per provider and model, shared by all
+# LLM requests of the process.
+_rate_limits: dict[tuple[str, str], tuple[TokenBucket | None, TokenBucket | None]] = {}
+
+
+def get_rate_limits(
+    llm_provider: str,
+    llm_model: str,
+) -> tuple[TokenBucket | None, TokenBucket | None]:
+    """Get the rate limits of a model.
+
+    :param llm_provider: The provider.
+    :param llm_model: The model.
+    :return: The requests per minute and the tokens per minute budgets of the
+        model, None for a budget that is not configured.
+    """
+    key = (llm_provider, llm_model)
+    if key in _rate_limits:
+        return _rate_limits[key]
+
+    provider_limits = (config.llm_rate_limits or {}).get(llm_provider) or {}
+    model_limits = provider_limits.get(llm_model) or {}
+    requests_per_minute = model_limits.get("requests_per_minute")
+    tokens_per_minute = model_limits.get("tokens_per_minute")
+    rate_limits = _rate_limits[key] = (
+        TokenBucket(per_minute=requests_per_minute) if requests_per_minute else None,
+        TokenBucket(per_minute=tokens_per_minute) if tokens_per_minute else None,
+    )
+    for name, bucket in zip(("requests", "tokens"), rate_limits, strict=True):
+        if bucket is not None:
+            metrics.register_gauge(
+                f"llm_rate_limit.{llm_provider}.{llm_model}.{name}_available",
+                lambda bucket=bucket: bucket.available,
+            )
+    return rate_limits
+
+
+def clear_rate_limits() -> None:
+    """Forget the rate limits, such that they are rebuilt from the config."""
+    _rate_limits.clear()
+
+
+register_reload_hook(clear_rate_limits)
+
+
+# Errors an LLM request fails with once it is not retried anymore.
+LLM_ERRORS = (openai.OpenAIError, httpx.HTTPError, CircuitOpenError, TimeoutError)
+
+
+def is_transient_llm_error(exception: BaseException) -> bool:
+    """Check whether an LLM request failed for a reason that may go away on retry."""
+    return is_transient_error(exception) or isinstance(
+        exception,
+        openai.APIConnectionError,
+    )
+
+
+# Circuit breakers per provider, created on first use.
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(llm_provider: str) -> CircuitBreaker:
+    """Get the circuit breaker of a provider.
+
+    :param llm_provider: The provider.
+    :return: The circuit breaker.
+    """
+    if llm_provider not in _circuit_breakers:
+        _circuit_breakers[llm_provider] = CircuitBreaker(
+            name=f"llm.{llm_provider}",
+            is_failure=is_transient_llm_error,
+            **config.resilience.circuit_breaker,
+        )
+    return _circuit_breakers[llm_provider]
+
+
+# Times to the first token of recent LLM requests, which decide when to hedge.
+_first_token_latencies = LatencyTracker(
+    window=config.resilience.hedging.window,
+    min_samples=config.resilience.hedging.min_samples,
+)
 
 
 async def ask_llm(
     system_prompt: str,
     user_prompt: str,
     memory: list[BaseMessage] | None = None,
-    llm_model: str = config.provider_to_llm[config.llm_provider],
+    llm_model: str | None = None,
 ) -> AsyncIterator[str]:
     """Ask the LLM for a response.
 
+    Transient errors are retried with jittered exponential backoff, as long as
+    no token was received. If hedging is enabled, a second request is started
+    when the first token takes longer than a percentile of recent requests.
+    Requests to a provider that keeps failing are suspended by its circuit
+    breaker.
+
     :param system_prompt: The system prompt.
     :param user_prompt: The user prompt.
+    :param memory: Earlier messages of the conversation.
+    :param llm_model: The model, defaults to the configured one.
     :return: The LLM response.
     """
     memory = memory or []
@@ -50,8 +275,95 @@ async def ask_llm(
         *memory,
         HumanMessage(content=user_prompt),
     ]
-    chat_model = get_chat_model(llm_model=llm_model)
+    llm_provider = config.llm_provider
+    llm_model = llm_model or config.provider_to_llm[llm_provider]
+    chat_model = get_chat_model(llm_model=llm_model, llm_provider=llm_provider)
+
+    hedging = config.resilience.hedging
+    hedge_after = (
+        _first_token_latencies.get_percentile(hedging.percentile)
+        if hedging.enabled
+        else None
+    )
+
+    def start_hedged_stream() -> AsyncIterator[str]:
+        return hedged_stream(
+            lambda admitted: _stream_llm(
+                chat_model=chat_model,
+                messages=messages,
+                llm_provider=llm_provider,
+                llm_model=llm_model,
+                admitted=admitted,
+            ),
+            hedge_after=hedge_after,
+            name="llm",
+        )
+
+    async for content in retry_stream(
+        start_hedged_stream,
+        retry_config=config.resilience.retries,
+        is_retryable=is_transient_llm_error,
+        name="llm",
+    ):
+        yield content
+
+
+async def _stream_llm(
+    chat_model: BaseChatModel,
+    messages: list[BaseMessage],
+    llm_provider: str,
+    llm_model: str,
+    admitted: asyncio.Event,
+) -> AsyncIterator[str]:
+    """Send a single request to the LLM and stream its response.
+
+    The request first waits for the requests and tokens per minute budgets of
+    the model. The estimated prompt tokens are charged up front and reconciled
+    with the actual usage once the response is complete. It then waits for a
+    slot of the LLM limiter, which it holds until the response is complete.
+    The time to the first token is measured from getting the slot, such that
+    it does not include local queueing.
+
+    :param chat_model: The chat model.
+    :param messages: The messages to send.
+    :param llm_provider: The provider.
+    :param llm_model: The model.
+    :param admitted: Event set once the request holds a slot of the limiter.
+    :return: The LLM response.
+    """
+    request_budget, token_budget = get_rate_limits(llm_provider, llm_model)
+    charged_tokens = sum(estimate_tokens(message.content) for message in messages)
+    waited = 0.0
+    if request_budget is not None:
+        waited += await request_budget.acquire()
+    if token_budget is not None:
+        waited += await token_budget.acquire(charged_tokens)
+    if waited:
+        metrics.increment("llm_rate_limit.wait_seconds", waited)
 
-    answer_iterator = chat_model.astream(input=messages)
-    async for answer in answer_iterator:
-        yield answer.content
+    answer_parts: list[str] = []
+    used_tokens: int | None = None
+    try:
+        async with (
+            get_circuit_breaker(llm_provider).guard(),
+            llm_limiter.acquire() as permit,
+        ):
+            started_at = time.monotonic()
+            admitted.set()
+            answer_iterator = chat_model.astream(input=messages)
+            async for answer in answer_iterator:
+                if not answer_parts:
+                    # The time to the first token tells how loaded the provider
+                    # is, regardless of the length of the answer.
+                    permit.mark_latency()
+                    _first_token_latencies.record(time.monotonic() - started_at)
+                if answer.usage_metadata:
+                    used_tokens = answer.usage_metadata["total_tokens"]
+                answer_parts.append(answer.content)
+                yield answer.content
+    finally:
+        if token_budget is not None:
+            if used_tokens is None:
+                # Not all providers report usage when streaming.
+                used_tokens = charged_tokens + estimate_tokens("".join(answer_parts))
+            token_budget.adjust(charged_tokens - used_tokens)
@@ -0,0 +1,50 @@
+"""In-process metrics."""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from typing import Callable, Self
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """Registry of counters and gauges of this process."""
+
+    def __init__(self: Self) -> None:
+        """Initialize an empty registry."""
+        self._counters: defaultdict[str, float] = defaultdict(float)
+        self._gauges: dict[str, Callable[[], float]] = {}
+
+    def increment(self: Self, name: str, value: float = 1) -> None:
+        """Increment a counter.
+
+        :param name: Name of the counter.
+        :param value: Amount to increment the counter with.
+        """
+        self._counters[name] += value
+
+    def register_gauge(self: Self, name: str, callback: Callable[[], float]) -> None:
+        """Register a gauge, whose value is read when the metrics are collected.
+
+        :param name: Name of the gauge.
+        :param callback: Function returning the current value of the gauge.
+        """
+        self._gauges[name] = callback
+
+    def collect(self: Self) -> dict[str, float]:
+        """Collect the current value of all counters and gauges.
+
+        :return: Mapping from metric name to value.
+        """
+        values = dict(self._counters)
+        for name, callback in self._gauges.items():
+            try:
+                values[name] = callback()
+            except Exception:
+                logger.exception(f"Failed to collect gauge {name}.")
+        return dict(sorted(values.items()))
+
+
+metrics = Metrics()
@@ -0,0 +1,82 @@
+"""Keyset pagination of lists."""
+
+from typing import Any, TypeVar
+
+from fastapi import Request
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.common.models.page import Page
+from api.utils.database import orm_to_pydantic
+
+TypeVarBaseModel = TypeVar("TypeVarBaseModel", bound=BaseModel)
+
+
+async def fetch_page(
+    session: AsyncSession,
+    statement: Select,
+    id_column: Any,
+    pydantic_class: type[TypeVarBaseModel],
+    limit: int,
+    after: int | None = None,
+) -> Page[TypeVarBaseModel]:
+    """Fetch a page of rows ordered by ID.
+
+    Pages start after the last ID of the previous page, rather than at an
+    offset, such that a page is read from the index alone however deep it is.
+
+    :param session: The database session.
+    :param statement: The statement selecting the rows, with any filters.
+    :param id_column: The ID column of the rows.
+    :param pydantic_class: The Pydantic class of the items.
+    :param limit: The maximum number of items on the page.
+    :param after: The ID to start after, or None for the first page.
+    :return: The page.
+    """
+    result = await session.execute(
+        get_page_statement(statement, id_column=id_column, limit=limit, after=after),
+    )
+    rows = result.scalars().all()
+    items = [orm_to_pydantic(row, pydantic_class) for row in rows[:limit]]
+    return Page(
+        items=items,
+        next_after=rows[limit - 1].id if len(rows) > limit else None,
+    )
+
+
+def get_page_statement(
+    statement: Select,
+    id_column: Any,
+    limit: int,
+    after: int | None = None,
+) -> Select:
+    """Get the statement selecting a page of rows ordered by ID.
+
+    One row more than the limit is selected, which tells whether there is a
+    next page.
+
+    :param statement: The statement selecting the rows, with any filters.
+    :param id_column: The ID column of the rows.
+    :param limit: The maximum number of rows on the page.
+    :param after: The ID to start after, or None for the first page.
+    :return: The statement selecting the page.
+    """
+    if after is not None:
+        statement = statement.where(id_column > after)
+    return statement.order_by(id_column).limit(limit + 1)
+
+
+def get_link_header(request: Request, page: Page) -> dict[str, str]:
+    """Get the header linking to the next page of a list, if any.
+
+    The link keeps the query parameters of the request.
+
+    :param request: The request of the page.
+    :param page: The page.
+    :return: The Link header, or no header on the last page.
+    """
+    if page.next_after is None:
+        return {}
+    next_url = request.url.include_query_params(after=page.next_after)
+    return {"Link": f'<{next_url}>; rel="next"'}
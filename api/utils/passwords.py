@@ -0,0 +1,41 @@
+"""Password hashing, off the event loop."""
+
+from bcrypt import checkpw, gensalt, hashpw
+
+from api.config import config
+from api.utils.concurrency import BoundedThreadPool
+
+# bcrypt takes hundreds of milliseconds by design; in a thread it does not
+# stall the event loop, and the cap keeps logins from starving the other work.
+password_hashing_pool = BoundedThreadPool(
+    name="password_hashing",
+    max_workers=config.password_hashing.max_workers,
+)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password with a random salt.
+
+    :param password: The password.
+    :return: The bcrypt hash.
+    """
+    password_hash = await password_hashing_pool.run(
+        hashpw,
+        password.encode("utf-8"),
+        gensalt(),
+    )
+    return password_hash.decode("utf-8")
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    """Check a password against its hash.
+
+    :param password: The password.
+    :param password_hash: The bcrypt hash.
+    :return: Whether the password matches.
+    """
+    return await password_hashing_pool.run(
+        checkpw,
+        password.encode("utf-8"),
+        password_hash.encode("utf-8"),
+    )
@@ -0,0 +1,69 @@
+"""Rate limiting."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Self
+
+
+class TokenBucket:
+    """Budget of a quantity per minute, refilled continuously.
+
+    Callers waiting for the budget are served in order of arrival. The budget
+    may be overdrawn when a charge is reconciled upwards, in which case later
+    callers wait for the debt to be refilled.
+    """
+
+    def __init__(self: Self, per_minute: float) -> None:
+        """Initialize a full bucket.
+
+        :param per_minute: The budget per minute, which is also the capacity.
+        """
+        self.capacity = per_minute
+        self._refill_rate = per_minute / 60
+        self._available = per_minute
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def available(self: Self) -> float:
+        """Budget available right now, negative if overdrawn."""
+        self._refill()
+        return self._available
+
+    def _refill(self: Self) -> None:
+        """Add the budget accrued since the last refill."""
+        now = time.monotonic()
+        self._available = min(
+            self._available + (now - self._updated_at) * self._refill_rate,
+            self.capacity,
+        )
+        self._updated_at = now
+
+    async def acquire(self: Self, amount: float = 1) -> float:
+        """Wait until the amount is available and take it.
+
+        Amounts above the capacity wait for a full bucket.
+
+        :param amount: The amount to take.
+        :return: Seconds waited.
+        """
+        started_at = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._available < min(amount, self.capacity):
+                await asyncio.sleep(
+                    (min(amount, self.capacity) - self._available) / self._refill_rate,
+                )
+                self._refill()
+            self._available -= amount
+        return time.monotonic() - started_at
+
+    def adjust(self: Self, amount: float) -> None:
+        """Give back part of a charge, or charge more if the amount is negative.
+
+        :param amount: The amount to give back.
+        """
+        self._refill()
+        self._available = min(self._available + amount, self.capacity)
@@ -0,0 +1,335 @@
+"""Retries, hedging and circuit breaking around calls to upstream services."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+from enum import StrEnum, auto
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Self, TypeVar
+
+import httpx
+
+from api.utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from box import Box
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Statuses of responses that may succeed when the request is sent again.
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def is_transient_error(exception: BaseException) -> bool:
+    """Check whether a request failed for a reason that may go away on retry.
+
+    :param exception: The error of the request.
+    :return: Whether the error is a network error, a timeout or a transient status.
+    """
+    if isinstance(exception, httpx.TransportError | TimeoutError):
+        return True
+    if isinstance(exception, httpx.HTTPStatusError):
+        return exception.response.status_code in TRANSIENT_STATUS_CODES
+    return getattr(exception, "status_code", None) in TRANSIENT_STATUS_CODES
+
+
+def get_backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Get the delay before retrying, with exponential backoff and full jitter.
+
+    :param attempt: The number of the failed attempt, starting at 0.
+    :param base_delay: The maximum delay after the first attempt, in seconds.
+    :param max_delay: The maximum delay after any attempt, in seconds.
+    :return: A random delay in seconds.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))  # noqa: S311
+
+
+async def retry(
+    call: Callable[[], Awaitable[T]],
+    retry_config: Box,
+    is_retryable: Callable[[Exception], bool],
+    name: str = "call",
+) -> T:
+    """Call an idempotent function, retrying it on transient errors.
+
+    :param call: The function to call.
+    :param retry_config: The maximum number of attempts, and the base_delay and
+        max_delay of the backoff, in seconds.
+    :param is_retryable: Whether an error is transient.
+    :param name: Name of the call, used for logging and metrics.
+    :return: The result of the call.
+    """
+    for attempt in range(retry_config.attempts):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt + 1 >= retry_config.attempts or not is_retryable(e):
+                raise
+            await _wait_before_retry(name, attempt, e, retry_config)
+    message = "Attempts must be positive."
+    raise ValueError(message)
+
+
+async def retry_stream(
+    start: Callable[[], AsyncIterator[T]],
+    retry_config: Box,
+    is_retryable: Callable[[Exception], bool],
+    name: str = "stream",
+) -> AsyncIterator[T]:
+    """Iterate over a stream, restarting it on transient errors.
+
+    A stream is only restarted as long as nothing was received from it, since
+    the items already passed on cannot be taken back.
+
+    :param start: The function starting the stream.
+    :param retry_config: The maximum number of attempts, and the base_delay and
+        max_delay of the backoff, in seconds.
+    :param is_retryable: Whether an error is transient.
+    :param name: Name of the stream, used for logging and metrics.
+    :return: Iterator over the items of the stream.
+    """
+    for attempt in range(retry_config.attempts):
+        received = False
+        try:
+            async for item in start():
+                received = True
+                yield item
+        except Exception as e:
+            if (
+                received
+                or attempt + 1 >= retry_config.attempts
+                or not is_retryable(e)
+            ):
+                raise
+            await _wait_before_retry(name, attempt, e, retry_config)
+        else:
+            return
+
+
+async def _wait_before_retry(
+    name: str,
+    attempt: int,
+    error: Exception,
+    retry_config: Box,
+) -> None:
+    """Log a failed attempt and wait before the next one."""
+    delay = get_backoff_delay(
+        attempt,
+        base_delay=retry_config.base_delay,
+        max_delay=retry_config.max_delay,
+    )
+    logger.warning(
+        f"Attempt {attempt + 1} of {name} failed with {error!r}, "
+        f"retrying in {delay:.1f} seconds.",
+    )
+    metrics.increment(f"{name}.retries")
+    await asyncio.sleep(delay)
+
+
+class LatencyTracker:
+    """Percentiles of the latencies of the most recent calls."""
+
+    def __init__(self: Self, window: int, min_samples: int) -> None:
+        """Initialize an empty tracker.
+
+        :param window: Number of most recent latencies kept.
+        :param min_samples: Number of latencies needed before percentiles are known.
+        """
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def record(self: Self, latency: float) -> None:
+        """Record the latency of a call, in seconds."""
+        self._latencies.append(latency)
+
+    def get_percentile(self: Self, percentile: float) -> float | None:
+        """Get a percentile of the recorded latencies.
+
+        :param percentile: The percentile, between 0 and 100.
+        :return: The latency in seconds, or None if too few were recorded.
+        """
+        if len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        index = min(round(percentile / 100 * (len(latencies) - 1)), len(latencies) - 1)
+        return latencies[index]
+
+
+async def hedged_stream(
+    start: Callable[[asyncio.Event], AsyncIterator[T]],
+    hedge_after: float | None,
+    name: str = "stream",
+) -> AsyncIterator[T]:
+    """Iterate over a stream, starting a second one if the first item is slow.
+
+    A stream sets the event it is started with once it is admitted, e.g. holds
+    a local concurrency permit. The wait for the first item only starts then,
+    such that no second stream is started while the first one is still queued
+    locally. Whichever stream yields its first item first is passed on, the
+    other one is cancelled. The second stream is only awaited if the first one
+    fails before its first item.
+
+    :param start: The function starting the stream, given the event to set once
+        the stream is admitted.
+    :param hedge_after: Seconds to wait for the first item of the admitted
+        stream before starting the second stream, or None to never start one.
+    :param name: Name of the stream, used for logging and metrics.
+    :return: Iterator over the items of the winning stream.
+    """
+    admitted = asyncio.Event()
+    streams = [start(admitted)]
+    first_item = asyncio.ensure_future(anext(streams[0]))
+    first_items = {first_item: streams[0]}
+    if hedge_after is not None:
+        admission = asyncio.ensure_future(admitted.wait())
+        try:
+            await asyncio.wait(
+                {first_item, admission},
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            admission.cancel()
+        done, _ = await asyncio.wait({first_item}, timeout=hedge_after)
+        if not done:
+            logger.info(f"No answer of {name} after {hedge_after:.1f}s, hedging.")
+            metrics.increment(f"{name}.hedged")
+            streams.append(start(asyncio.Event()))
+            first_items[asyncio.ensure_future(anext(streams[1]))] = streams[1]
+
+    winner: asyncio.Future | None = None
+    pending = set(first_items)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(
+                pending,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            winner = next(
+                (
+                    future
+                    for future in done
+                    if not isinstance(future.exception(), Exception)
+                    or isinstance(future.exception(), StopAsyncIteration)
+                ),
+                None,
+            )
+    finally:
+        for future in pending:
+            future.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if winner is None:
+        # All streams failed; report the error of the first one.
+        raise next(iter(first_items)).exception()
+
+    stream = first_items[winner]
+    try:
+        if isinstance(winner.exception(), StopAsyncIteration):
+            return
+        yield winner.result()
+        async for item in stream:
+            yield item
+    finally:
+        for started_stream in streams:
+            with suppress(Exception):
+                await started_stream.aclose()
+
+
+class CircuitState(StrEnum):
+    """State of a circuit breaker."""
+
+    closed = auto()
+    open = auto()
+    half_open = auto()
+
+
+class CircuitOpenError(Exception):
+    """Calls to an upstream service are suspended after repeated failures."""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream service that keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail immediately. After reset_timeout seconds a single trial call is let
+    through: the circuit closes if it succeeds and opens again otherwise.
+    """
+
+    def __init__(
+        self: Self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        is_failure: Callable[[Exception], bool] = lambda _: True,
+    ) -> None:
+        """Initialize a closed circuit breaker.
+
+        :param name: Name of the upstream service, used for logging and metrics.
+        :param failure_threshold: Consecutive failures that open the circuit.
+        :param reset_timeout: Seconds the circuit stays open before a trial call.
+        :param is_failure: Whether an error counts as a failure of the upstream.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._is_failure = is_failure
+        self.state = CircuitState.closed
+        self._failures = 0
+        self._opened_at = 0.0
+
+        metrics.register_gauge(
+            f"{name}.circuit_open",
+            lambda: float(self.state != CircuitState.closed),
+        )
+
+    @asynccontextmanager
+    async def guard(self: Self) -> AsyncIterator[None]:
+        """Run a call through the circuit breaker.
+
+        :raises CircuitOpenError: If the circuit is open.
+        """
+        if self.state == CircuitState.open:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                metrics.increment(f"{self.name}.circuit_rejected")
+                message = f"Circuit of {self.name} is open after repeated failures."
+                raise CircuitOpenError(message)
+            self.state = CircuitState.half_open
+        elif self.state == CircuitState.half_open:
+            message = f"Circuit of {self.name} is half open, awaiting a trial call."
+            raise CircuitOpenError(message)
+
+        try:
+            yield
+        except Exception as e:
+            if self._is_failure(e):
+                self._on_failure()
+            elif self.state == CircuitState.half_open:
+                self.state = CircuitState.closed
+            raise
+        except BaseException:
+            if self.state == CircuitState.half_open:
+                # The trial call was cancelled; let the next call try.
+                self.state = CircuitState.open
+                self._opened_at = 0.0
+            raise
+        else:
+            self._failures = 0
+            self.state = CircuitState.closed
+
+    def _on_failure(self: Self) -> None:
+        """Count a failure, opening the circuit if there are too many."""
+        self._failures += 1
+        if (
+            self.state == CircuitState.half_open
+            or self._failures >= self.failure_threshold
+        ):
+            if self.state != CircuitState.open:
+                logger.warning(f"Open the circuit of {self.name}.")
+            self.state = CircuitState.open
+            self._opened_at = time.monotonic()
@@ -0,0 +1,109 @@
+"""Serialization and compression of responses."""
+
+import asyncio
+import gzip
+from typing import Any
+
+from fastapi import Request, Response
+from pydantic_core import to_json
+
+from api.config import config
+
+# Brotli is optional; without it, responses are compressed with gzip only.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def json_response(
+    content: Any,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Serialize models produced by the API itself into a response.
+
+    Unlike returning the models from a route, they are not validated against
+    the response model again before they are serialized.
+
+    :param content: The models to serialize, or anything else JSON serializable.
+    :param status_code: The status code of the response.
+    :param headers: The headers of the response.
+    :return: The response.
+    """
+    return Response(
+        content=to_json(content),
+        status_code=status_code,
+        headers=headers,
+        media_type=JSON_MEDIA_TYPE,
+    )
+
+
+async def compressed_json_response(
+    request: Request,
+    content: Any,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Serialize models into a response compressed as the client accepts.
+
+    Brotli is preferred over gzip, if installed. Bodies below the minimum size
+    are not compressed. Compression runs in a thread, since large bodies take
+    a while.
+
+    :param request: The request, whose Accept-Encoding header is negotiated.
+    :param content: The models to serialize, or anything else JSON serializable.
+    :param status_code: The status code of the response.
+    :param headers: The headers of the response.
+    :return: The response.
+    """
+    body = to_json(content)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    encoding = get_content_encoding(request.headers.get("Accept-Encoding", ""))
+    if (
+        config.response_compression.enabled
+        and encoding is not None
+        and len(body) >= config.response_compression.min_size
+    ):
+        body = await asyncio.to_thread(_compress, body, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return Response(
+        content=body,
+        status_code=status_code,
+        headers=headers,
+        media_type=JSON_MEDIA_TYPE,
+    )
+
+
+def get_content_encoding(accept_encoding: str) -> str | None:
+    """Choose the encoding of a response from the Accept-Encoding header.
+
+    :param accept_encoding: The value of the Accept-Encoding header.
+    :return: "br", "gzip", or None to leave the response uncompressed.
+    """
+    accepted = set()
+    for coding in accept_encoding.split(","):
+        name, _, parameters = coding.strip().partition(";")
+        quality = parameters.strip().removeprefix("q=")
+        try:
+            if parameters and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip().lower())
+
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with a content encoding."""
+    if encoding == "br":
+        return brotli.compress(body, quality=config.response_compression.brotli_quality)
+    return gzip.compress(body, compresslevel=config.response_compression.gzip_level)
@@ -0,0 +1,108 @@
+"""Benchmark the latency of the event loop under concurrent logins.
+
+Concurrent requests are sent to /token of the app, in process. The user is
+served from memory, such that the password check is all that is measured.
+Meanwhile a task sleeps in short intervals, and how late it wakes up is the
+latency any other request, e.g. a streamed review, suffers.
+
+Run from the repository root:
+
+    python -m benchmarks.token_login --logins 20
+    python -m benchmarks.token_login --logins 20 --inline
+
+With --inline, passwords are checked on the event loop, as a baseline.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from bcrypt import checkpw, gensalt, hashpw
+
+import api.common.repositories.users as users_repository
+from api.api import api
+from api.common.models.user import User
+from api.common.services import auth_service
+
+USERNAME = "benchmark"
+PASSWORD = "benchmark-password"  # noqa: S105
+# Interval of the task sampling the event loop latency, in seconds.
+SAMPLE_INTERVAL = 0.005
+
+
+async def sample_loop_latency(stop: asyncio.Event) -> list[float]:
+    """Sample how late a sleeping task wakes up, until stopped.
+
+    :param stop: Event stopping the sampling.
+    :return: The latencies, in seconds.
+    """
+    latencies = []
+    while not stop.is_set():
+        started_at = time.perf_counter()
+        await asyncio.sleep(SAMPLE_INTERVAL)
+        latencies.append(time.perf_counter() - started_at - SAMPLE_INTERVAL)
+    return latencies
+
+
+async def run_benchmark(logins: int, *, inline: bool) -> None:
+    """Log in concurrently and report the event loop latency meanwhile.
+
+    :param logins: Number of concurrent logins.
+    :param inline: Whether to check passwords on the event loop.
+    """
+    user = User(
+        id=1,
+        username=USERNAME,
+        password_hash=hashpw(PASSWORD.encode("utf-8"), gensalt()).decode("utf-8"),
+        is_active=True,
+        is_superuser=False,
+    )
+
+    async def read_user(username: str) -> User:  # noqa: ARG001
+        return user
+
+    async def verify_password_inline(password: str, password_hash: str) -> bool:
+        return checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+    users_repository.read_user = read_user
+    if inline:
+        auth_service.verify_password = verify_password_inline
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=api),
+        base_url="http://benchmark",
+    ) as client:
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_loop_latency(stop))
+        started_at = time.perf_counter()
+        responses = await asyncio.gather(
+            *(client.post("/token", auth=(USERNAME, PASSWORD)) for _ in range(logins)),
+        )
+        elapsed = time.perf_counter() - started_at
+        stop.set()
+        latencies = sorted(await sampler)
+
+    failed = sum(response.status_code != httpx.codes.OK for response in responses)
+    p99 = latencies[min(round(0.99 * (len(latencies) - 1)), len(latencies) - 1)]
+    print(  # noqa: T201
+        f"{logins} logins ({'inline' if inline else 'thread pool'}, {failed} failed) "
+        f"in {elapsed:.2f}s; event loop latency "
+        f"p50 {statistics.median(latencies) * 1000:.1f}ms, "
+        f"p99 {p99 * 1000:.1f}ms, max {latencies[-1] * 1000:.1f}ms "
+        f"over {len(latencies)} samples.",
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--inline", action="store_true")
+    arguments = parser.parse_args()
+    asyncio.run(run_benchmark(logins=arguments.logins, inline=arguments.inline))
+
+
+if __name__ == "__main__":
+    main()
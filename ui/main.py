@@ -53,7 +53,7 @@ def add_review(repository_id, pull_request_id):
         f"{API_BASE_URL}/repositories/{repository_id}/pull_requests/{pull_request_id}/reviews",
         headers=HEADERS,
     )
-    if response.status_code == 201:
+    if response.status_code == 202:
         return response.json()
     return []
 
@@ -152,7 +152,7 @@ if "selected_pr_id" in st.session_state:
                 st.session_state["selected_repo_id"],
                 st.session_state["selected_pr_id"],
             ):
-                st.success("Review added successfully!")
+                st.success("Review queued successfully!")
             else:
                 st.error("Failed to add review.")
 